@@ -1,32 +1,143 @@
+import atexit
 import asyncio
 import base64
+import collections
+import contextlib
+import hashlib
+import importlib
+import io
+import json
 import logging
+import multiprocessing
 import os
 import platform
 import re
 import shutil
+import signal
+import socket
 import subprocess
 import tempfile
+import threading
+import time
 import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import unquote, urlsplit
 import sys
-import nest_asyncio
-import cv2
-import numpy as np
-import openai
+
+_startup_started = time.perf_counter()
 import pyotp
-import soundfile as sf
-from agixtsdk import AGiXTSDK
-from IPython.display import Image, display
 from playwright.async_api import async_playwright
-from pyzbar.pyzbar import decode
-from tqdm import tqdm
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
-openai.base_url = os.getenv("EZLOCALAI_URI")
-openai.api_key = os.getenv("EZLOCALAI_API_KEY", "none")
+
+# Set IMPORT_PROFILE=true to log how long every dependency took to import
+IMPORT_PROFILE = os.getenv("IMPORT_PROFILE", "false") == "true"
+IMPORT_TIMES = {"startup": time.perf_counter() - _startup_started}
+
+
+class LazyModule:
+    """
+    Stands in for a module that is only imported when one of its attributes is first used.
+
+    Video, audio, QR and notebook dependencies take seconds to import and many runs
+    never touch them, so they are loaded on demand and their import time is recorded.
+
+    Args:
+        name (str): Module to import
+        on_load (callable): Optional function called with the module once imported
+    """
+
+    def __init__(self, name, on_load=None):
+        self.__dict__.update(
+            {
+                "_name": name,
+                "_on_load": on_load,
+                "_module": None,
+                "_lock": threading.Lock(),
+            }
+        )
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    if self._on_load:
+                        self._on_load(module)
+                    IMPORT_TIMES[self._name] = time.perf_counter() - start
+                    if IMPORT_PROFILE:
+                        logging.info(
+                            f"Imported {self._name} in {IMPORT_TIMES[self._name]:.3f}s"
+                        )
+                    self.__dict__["_module"] = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+
+def configure_openai(module):
+    module.base_url = os.getenv("EZLOCALAI_URI")
+    module.api_key = os.getenv("EZLOCALAI_API_KEY", "none")
+
+
+cv2 = LazyModule("cv2")
+httpx = LazyModule("httpx")
+ipython_display = LazyModule("IPython.display")
+nest_asyncio = LazyModule("nest_asyncio")
+np = LazyModule("numpy")
+openai = LazyModule("openai", on_load=configure_openai)
+pyzbar = LazyModule("pyzbar.pyzbar")
+sf = LazyModule("soundfile")
+StandIn = LazyModule("StandIn")
+tqdm = LazyModule("tqdm")
+
+
+def log_import_profile():
+    """Logs the import time of the eager imports and of every lazily loaded module"""
+    lines = [
+        f"  {seconds:7.3f}s {name}"
+        for name, seconds in sorted(
+            IMPORT_TIMES.items(), key=lambda item: item[1], reverse=True
+        )
+    ]
+    logging.info("Import times:\n" + "\n".join(lines))
+
+
+if IMPORT_PROFILE:
+    atexit.register(log_import_profile)
+
+# Rate at which still frames are streamed into ffmpeg, ffmpeg duplicates them up to the
+# output frame rate which is far cheaper than piping every output frame
+FRAME_INPUT_FPS = 5
+AUDIO_BITRATE_KBPS = 128
+# Below this the screenshots become unreadable, so the size limit gives way instead
+MIN_VIDEO_BITRATE_KBPS = 100
+NARRATION_MODEL = "tts-1"
+NARRATION_VOICE = "HAL9000"
+NARRATION_LANGUAGE = "en"
+# TTS requests in flight at once, and how long a single one may take in seconds
+NARRATION_CONCURRENCY = int(os.getenv("NARRATION_CONCURRENCY", "8"))
+NARRATION_TIMEOUT = 30
+# Screenshots being verified by the agent at once when the verify feature is on
+VERIFY_CONCURRENCY = int(os.getenv("VERIFY_CONCURRENCY", "4"))
+# Verification images are downscaled to this longest edge and re-encoded
+VERIFY_MAX_EDGE = int(os.getenv("VERIFY_MAX_EDGE", "1024"))
+VERIFY_IMAGE_FORMAT = os.getenv("VERIFY_IMAGE_FORMAT", "webp")
+VERIFY_IMAGE_QUALITY = int(os.getenv("VERIFY_IMAGE_QUALITY", "80"))
+# A one-time password must stay valid for this many seconds after it is generated,
+# enough to type and submit it, otherwise the next one is awaited
+TOTP_MIN_VALIDITY = float(os.getenv("TOTP_MIN_VALIDITY", "10"))
+# AGiXT API used for verification, point it at a local stand-in to run offline
+AGIXT_URI = os.getenv("AGIXT_URI", "https://api.agixt.dev")
+AGIXT_TIMEOUT = float(os.getenv("AGIXT_TIMEOUT", "120"))
 
 
 async def print_args(msg):
@@ -40,20 +151,2021 @@ async def print_args(msg):
             print("CONSOLE MESSAGE:", text_value)
 
 
+async def fresh_totp(secret, min_validity=TOTP_MIN_VALIDITY):
+    """
+    Generates a one-time password that is not about to expire
+
+    Args:
+        secret (str): Base32 TOTP secret
+        min_validity (float): Seconds the code has to remain valid for
+
+    Returns:
+        str: The current code, or the next one if the current one expires too soon
+    """
+    totp = pyotp.TOTP(secret)
+    remaining = totp.interval - time.time() % totp.interval
+    if remaining < min_validity:
+        logging.info(
+            f"One-time password expires in {remaining:.1f}s, waiting for the next"
+        )
+        await asyncio.sleep(remaining + 0.1)
+    return totp.now()
+
+
+def find_otp_secret(text):
+    """Returns the secret of an otpauth URI found in the text, or None"""
+    match = re.search(r"otpauth://\S*?[?&]secret=([A-Za-z2-7]+)", unquote(text or ""))
+    return match.group(1) if match else None
+
+
 def is_desktop():
     return not platform.system() == "Linux"
 
 
+READINESS_SCRIPT = """
+(() => {
+    if (window.__readiness) return;
+    const state = { lastMutation: performance.now() };
+    window.__readiness = state;
+    new MutationObserver(() => {
+        state.lastMutation = performance.now();
+    }).observe(document, {
+        subtree: true,
+        childList: true,
+        attributes: true,
+        characterData: true,
+    });
+})();
+"""
+
+READINESS_PROBE = """() => {
+    const state = window.__readiness;
+    // Infinite animations (spinners, pulses) never finish, only count finite ones
+    const animations = document.getAnimations
+        ? document.getAnimations().filter(
+              (a) => a.playState === 'running' && isFinite(a.effect?.getComputedTiming().endTime ?? Infinity)
+          ).length
+        : 0;
+    return {
+        readyState: document.readyState,
+        domQuietMs: state ? performance.now() - state.lastMutation : null,
+        animations: animations,
+    };
+}"""
+
+
+class PageReadiness:
+    """
+    Decides when a page has settled instead of sleeping for a fixed time.
+
+    The page is considered settled once the document has loaded, no tracked network
+    requests have been in flight for `network_quiet_ms`, the DOM has not mutated for
+    `dom_quiet_ms`, no finite animations are running and no navigation happened within
+    the quiet window. `max_wait_ms` is a hard cap after which waiting stops regardless.
+
+    Args:
+        page: Playwright page to watch
+        network_quiet_ms (int): Required time without network activity
+        dom_quiet_ms (int): Required time without DOM mutations
+        max_wait_ms (int): Hard cap on a single wait
+        poll_ms (int): Interval between checks
+    """
+
+    # Long-lived connections never finish and would keep the page busy forever
+    IGNORED_RESOURCE_TYPES = ("websocket", "eventsource", "media")
+    # Agent replies are awaited by ChatCompletionDetector rather than the settle wait
+    IGNORED_URL_PATTERNS = ("/v1/chat/completions",)
+
+    def __init__(
+        self,
+        page,
+        network_quiet_ms=500,
+        dom_quiet_ms=500,
+        max_wait_ms=15000,
+        poll_ms=100,
+    ):
+        self.page = page
+        self.network_quiet_ms = network_quiet_ms
+        self.dom_quiet_ms = dom_quiet_ms
+        self.max_wait_ms = max_wait_ms
+        self.poll_ms = poll_ms
+        self.pending = set()
+        self.last_network_activity = time.monotonic()
+        self.last_navigation = time.monotonic()
+        self.attached = False
+
+    async def attach(self):
+        if self.attached:
+            return
+        self.page.on("request", self._on_request)
+        self.page.on("requestfinished", self._on_request_done)
+        self.page.on("requestfailed", self._on_request_done)
+        self.page.on("framenavigated", self._on_navigated)
+        await self.page.add_init_script(READINESS_SCRIPT)
+        # The init script only runs on the next document, cover the current one too
+        await self.attach_current_document()
+        self.attached = True
+
+    def _on_request(self, request):
+        if request.resource_type in self.IGNORED_RESOURCE_TYPES:
+            return
+        if any(pattern in request.url for pattern in self.IGNORED_URL_PATTERNS):
+            return
+        self.pending.add(request)
+        self.last_network_activity = time.monotonic()
+
+    def _on_request_done(self, request):
+        if request in self.pending:
+            self.pending.discard(request)
+            self.last_network_activity = time.monotonic()
+
+    def _on_navigated(self, frame):
+        if frame == self.page.main_frame:
+            self.last_navigation = time.monotonic()
+
+    async def _probe(self):
+        try:
+            return await self.page.evaluate(READINESS_PROBE)
+        except Exception:
+            # Execution context is destroyed while navigating
+            return None
+
+    async def check(self):
+        """Returns a list of reasons the page is not settled yet, empty when settled"""
+        now = time.monotonic()
+        reasons = []
+        if (now - self.last_navigation) * 1000 < self.network_quiet_ms:
+            reasons.append("navigating")
+        if self.pending:
+            reasons.append(f"{len(self.pending)} requests in flight")
+        elif (now - self.last_network_activity) * 1000 < self.network_quiet_ms:
+            reasons.append("network recently active")
+        probe = await self._probe()
+        if probe is None:
+            reasons.append("document unavailable")
+        else:
+            if probe["readyState"] == "loading":
+                reasons.append("document loading")
+            if probe["domQuietMs"] is None:
+                await self.attach_current_document()
+                reasons.append("DOM observer not installed")
+            elif probe["domQuietMs"] < self.dom_quiet_ms:
+                reasons.append("DOM mutating")
+            if probe["animations"]:
+                reasons.append(f"{probe['animations']} animations running")
+        return reasons
+
+    async def attach_current_document(self):
+        try:
+            await self.page.evaluate(READINESS_SCRIPT)
+        except Exception:
+            pass
+
+    async def wait(self):
+        """
+        Waits until the page settles or the hard cap is reached
+
+        Returns:
+            float: Seconds actually waited
+        """
+        await self.attach()
+        start = time.monotonic()
+        deadline = start + self.max_wait_ms / 1000
+        while not self.page.is_closed():
+            reasons = await self.check()
+            if not reasons:
+                break
+            if time.monotonic() >= deadline:
+                logging.warning(
+                    f"Page did not settle within {self.max_wait_ms}ms: {', '.join(reasons)}"
+                )
+                break
+            await asyncio.sleep(self.poll_ms / 1000)
+        return time.monotonic() - start
+
+
+VITALS_SCRIPT = """
+(() => {
+    if (window.__vitals) return;
+    const vitals = {
+        reported: false,
+        ttfb: null,
+        fcp: null,
+        lcp: null,
+        cls: 0,
+        inp: 0,
+        longTasks: 0,
+        longTaskMs: 0,
+        resources: 0,
+        resourceBytes: 0,
+    };
+    window.__vitals = vitals;
+    const observe = (type, callback, options = {}) => {
+        try {
+            new PerformanceObserver((list) => list.getEntries().forEach(callback)).observe({
+                type,
+                buffered: true,
+                ...options,
+            });
+        } catch (e) {
+            // Entry type not supported by this browser
+        }
+    };
+    observe('navigation', (entry) => {
+        vitals.ttfb = entry.responseStart;
+    });
+    observe('paint', (entry) => {
+        if (entry.name === 'first-contentful-paint') vitals.fcp = entry.startTime;
+    });
+    observe('largest-contentful-paint', (entry) => {
+        vitals.lcp = entry.startTime;
+    });
+    observe('layout-shift', (entry) => {
+        if (!entry.hadRecentInput) vitals.cls += entry.value;
+    });
+    observe(
+        'event',
+        (entry) => {
+            if (entry.interactionId) vitals.inp = Math.max(vitals.inp, entry.duration);
+        },
+        { durationThreshold: 16 },
+    );
+    observe('longtask', (entry) => {
+        vitals.longTasks += 1;
+        vitals.longTaskMs += entry.duration;
+    });
+    observe('resource', (entry) => {
+        vitals.resources += 1;
+        vitals.resourceBytes += entry.transferSize || 0;
+    });
+})();
+"""
+
+VITALS_PROBE = """() => {
+    const vitals = window.__vitals;
+    if (!vitals) return null;
+    const sample = { ...vitals, path: location.pathname, navigation: !vitals.reported };
+    // Load metrics belong to the first step on a document, the rest to each step
+    vitals.reported = true;
+    vitals.cls = 0;
+    vitals.inp = 0;
+    vitals.longTasks = 0;
+    vitals.longTaskMs = 0;
+    vitals.resources = 0;
+    vitals.resourceBytes = 0;
+    return sample;
+}"""
+
+
+class WebVitalsCollector:
+    """
+    Collects Core Web Vitals and resource timing from the pages the suite visits.
+
+    A PerformanceObserver script is injected into every document. Each screenshot takes
+    a sample attributed to the current route: TTFB, FCP and LCP for the first sample of
+    a document, and layout shift, the slowest interaction, long tasks and resources
+    since the previous sample for every sample.
+    """
+
+    def __init__(self):
+        self.samples = []
+
+    async def attach(self, page):
+        await page.add_init_script(VITALS_SCRIPT)
+
+    @staticmethod
+    def route(path):
+        """Collapses ids in a path so visits to the same page share a route"""
+        return (
+            re.sub(r"/[0-9a-fA-F]{8}-[0-9a-fA-F-]{27,}", "/:id", path).rstrip("/")
+            or "/"
+        )
+
+    async def collect(self, page, step, lane="main"):
+        try:
+            sample = await page.evaluate(VITALS_PROBE)
+        except Exception:
+            # Execution context is destroyed while navigating
+            return
+        if not sample:
+            return
+        self.samples.append(
+            {
+                "route": self.route(sample["path"]),
+                "step": step,
+                "lane": lane,
+                "navigation": sample["navigation"],
+                "ttfb": sample["ttfb"] if sample["navigation"] else None,
+                "fcp": sample["fcp"] if sample["navigation"] else None,
+                "lcp": sample["lcp"] if sample["navigation"] else None,
+                "cls": sample["cls"],
+                "inp": sample["inp"],
+                "long_tasks": sample["longTasks"],
+                "long_task_ms": sample["longTaskMs"],
+                "resources": sample["resources"],
+                "resource_kb": sample["resourceBytes"] / 1024,
+            }
+        )
+
+    def table(self):
+        """
+        Aggregates the samples per route
+
+        Returns:
+            list: One row per route, in the order routes were first visited
+        """
+
+        def median(values):
+            values = sorted(value for value in values if value is not None)
+            return values[len(values) // 2] if values else None
+
+        rows = {}
+        for sample in self.samples:
+            rows.setdefault(sample["route"], []).append(sample)
+        return [
+            {
+                "route": route,
+                "samples": len(samples),
+                "loads": sum(1 for sample in samples if sample["navigation"]),
+                "ttfb": median(sample["ttfb"] for sample in samples),
+                "fcp": median(sample["fcp"] for sample in samples),
+                "lcp": median(sample["lcp"] for sample in samples),
+                "cls": max(sample["cls"] for sample in samples),
+                "inp": max(sample["inp"] for sample in samples),
+                "long_tasks": sum(sample["long_tasks"] for sample in samples),
+                "long_task_ms": sum(sample["long_task_ms"] for sample in samples),
+                "resources": sum(sample["resources"] for sample in samples),
+                "resource_kb": sum(sample["resource_kb"] for sample in samples),
+            }
+            for route, samples in rows.items()
+        ]
+
+    def report(self, directory):
+        """Writes the samples and the per-route table to vitals.json and logs the table"""
+        if not self.samples:
+            return
+        rows = self.table()
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "vitals.json"), "w") as f:
+            json.dump({"routes": rows, "samples": self.samples}, f, indent=2)
+
+        def ms(value):
+            return f"{value:.0f}" if value is not None else "-"
+
+        lines = [
+            f"{'Route':<24} {'Loads':>5} {'TTFB':>6} {'FCP':>6} {'LCP':>6} {'CLS':>6} "
+            f"{'INP':>5} {'Long tasks':>14} {'Resources':>16}"
+        ]
+        for row in rows:
+            lines.append(
+                f"{row['route'][:24]:<24} {row['loads']:>5} {ms(row['ttfb']):>6} "
+                f"{ms(row['fcp']):>6} {ms(row['lcp']):>6} {row['cls']:>6.3f} "
+                f"{ms(row['inp']):>5} "
+                f"{row['long_tasks']:>4} / {row['long_task_ms']:>5.0f}ms "
+                f"{row['resources']:>4} / {row['resource_kb']:>6.0f}KB"
+            )
+        logging.info("Web vitals per route (times in ms):\n" + "\n".join(lines))
+
+
+class ResourcePolicy:
+    """
+    Blocks page resources that logic-only and throughput runs do not need.
+
+    Requests are matched by resource type, by host (anything not served from the app's
+    own host) and by URL pattern, and blocked ones are aborted through `context.route`.
+    The "full" preset blocks nothing and installs no route at all, because routing also
+    turns off Playwright's HTTP cache; it records the size of every response instead,
+    and those sizes estimate the bytes saved when later runs block the same URLs.
+
+    Args:
+        preset (str): "full", "lean" or "minimal", see PRESETS
+        base_uri (str): App URI, requests to other hosts count as third party
+        block_types (list): Resource types to block, overrides the preset
+        block_patterns (list): Regular expressions, matching URLs are blocked
+        sizes_file (str): JSON file with response sizes learned from unblocked runs
+    """
+
+    PRESETS = {
+        "full": {"types": [], "third_party": False},
+        "lean": {"types": ["media", "font"], "third_party": True},
+        "minimal": {"types": ["image", "media", "font"], "third_party": True},
+    }
+    # The app cannot work without these, even when they come from another host
+    REQUIRED_TYPES = ("document", "xhr", "fetch", "websocket", "eventsource")
+
+    def __init__(
+        self,
+        preset="full",
+        base_uri="http://localhost:3437",
+        block_types=None,
+        block_patterns=None,
+        sizes_file=None,
+    ):
+        if preset not in self.PRESETS:
+            raise Exception(
+                f"Unknown resource policy {preset}, use one of {', '.join(self.PRESETS)}"
+            )
+        self.preset = preset
+        self.host = urlsplit(base_uri).netloc
+        self.block_types = set(
+            self.PRESETS[preset]["types"] if block_types is None else block_types
+        )
+        self.third_party = self.PRESETS[preset]["third_party"]
+        self.block_patterns = [re.compile(pattern) for pattern in block_patterns or []]
+        self.sizes_file = sizes_file
+        self.sizes = {}
+        if sizes_file:
+            try:
+                with open(sizes_file) as f:
+                    self.sizes = json.load(f)
+            except (OSError, ValueError):
+                # Missing, or cut short by a killed run, the sizes are learned again
+                self.sizes = {}
+        self.learned = False
+        self.blocked = {}
+
+    @classmethod
+    def from_env(cls, base_uri="http://localhost:3437", default="full"):
+        """Builds a policy from RESOURCE_* environment variables"""
+        block_types = os.getenv("RESOURCE_BLOCK_TYPES")
+        return cls(
+            preset=os.getenv("RESOURCE_POLICY", default),
+            base_uri=base_uri,
+            block_types=(
+                [value for value in block_types.split(",") if value]
+                if block_types is not None
+                else None
+            ),
+            block_patterns=[
+                value
+                for value in os.getenv("RESOURCE_BLOCK_PATTERNS", "").split(",")
+                if value
+            ],
+            sizes_file=os.getenv(
+                "RESOURCE_SIZES_FILE",
+                os.path.join("test_screenshots", ".resource_sizes.json"),
+            )
+            or None,
+        )
+
+    @property
+    def blocks(self):
+        return bool(self.block_types or self.third_party or self.block_patterns)
+
+    @staticmethod
+    def key(url):
+        return url.split("#", 1)[0].split("?", 1)[0]
+
+    def reason(self, url, resource_type):
+        """
+        Why a request is blocked
+
+        Returns:
+            str: "type", "third party" or "pattern", None when the request is allowed
+        """
+        if resource_type in self.REQUIRED_TYPES:
+            return None
+        if resource_type in self.block_types:
+            return "type"
+        if self.third_party and urlsplit(url).netloc != self.host:
+            return "third party"
+        if any(pattern.search(url) for pattern in self.block_patterns):
+            return "pattern"
+        return None
+
+    async def attach(self, context):
+        if self.blocks:
+            await context.route("**/*", self._route)
+        elif self.sizes_file:
+            context.on("response", self._learn)
+
+    async def _route(self, route):
+        request = route.request
+        reason = self.reason(request.url, request.resource_type)
+        if not reason:
+            await route.continue_()
+            return
+        entry = self.blocked.setdefault(
+            request.resource_type,
+            {"requests": 0, "bytes": 0, "unknown": 0, "reasons": {}},
+        )
+        entry["requests"] += 1
+        entry["reasons"][reason] = entry["reasons"].get(reason, 0) + 1
+        size = self.sizes.get(self.key(request.url))
+        if size is None:
+            entry["unknown"] += 1
+        else:
+            entry["bytes"] += size
+        await route.abort("blockedbyclient")
+
+    def _learn(self, response):
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            self.sizes[self.key(response.url)] = int(length)
+            self.learned = True
+
+    def merge(self, blocked, sizes=None):
+        """Adds the blocked request counts and learned sizes of another policy, e.g. from a shard"""
+        if sizes:
+            self.sizes.update(sizes)
+            self.learned = True
+        for resource_type, other in blocked.items():
+            entry = self.blocked.setdefault(
+                resource_type, {"requests": 0, "bytes": 0, "unknown": 0, "reasons": {}}
+            )
+            for field in ("requests", "bytes", "unknown"):
+                entry[field] += other[field]
+            for reason, count in other["reasons"].items():
+                entry["reasons"][reason] = entry["reasons"].get(reason, 0) + count
+
+    def report(self, directory):
+        """Writes blocked request counts to resources.json, logs them and saves learned sizes"""
+        if self.learned:
+            os.makedirs(
+                os.path.dirname(os.path.abspath(self.sizes_file)), exist_ok=True
+            )
+            # Write then rename so a killed run never leaves a partial file behind
+            temp_path = f"{self.sizes_file}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self.sizes, f)
+            os.replace(temp_path, self.sizes_file)
+        if not self.blocked:
+            return
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "resources.json"), "w") as f:
+            json.dump({"preset": self.preset, "blocked": self.blocked}, f, indent=2)
+        lines = [f"{'Type':<12} {'Blocked':>8} {'Saved':>10} {'Unknown size':>13}"]
+        for resource_type, entry in sorted(self.blocked.items()):
+            lines.append(
+                f"{resource_type:<12} {entry['requests']:>8} "
+                f"{entry['bytes'] / 1024:>8.0f}KB {entry['unknown']:>13}"
+            )
+        total = sum(entry["requests"] for entry in self.blocked.values())
+        saved = sum(entry["bytes"] for entry in self.blocked.values())
+        logging.info(
+            f"Resource policy {self.preset} blocked {total} requests, "
+            f"saving at least {saved / 1024:.0f}KB:\n" + "\n".join(lines)
+        )
+
+
+CHAT_OBSERVER_SCRIPT = """() => {
+    const state = { lastMutation: performance.now() };
+    window.__chatCompletion = state;
+    if (window.__chatCompletionObserver) window.__chatCompletionObserver.disconnect();
+    window.__chatCompletionObserver = new MutationObserver(() => {
+        state.lastMutation = performance.now();
+    });
+    window.__chatCompletionObserver.observe(document.body, {
+        subtree: true,
+        childList: true,
+        characterData: true,
+    });
+}"""
+
+CHAT_PROBE = """() => {
+    const state = window.__chatCompletion;
+    // Conversation name heading in the chat sidebar, "New Conversation" until renamed
+    const heading = document.querySelector('h4.text-lg');
+    return {
+        domQuietMs: state ? performance.now() - state.lastMutation : null,
+        conversationName: heading ? heading.textContent.trim() : null,
+    };
+}"""
+
+
+class ChatCompletionDetector:
+    """
+    Detects when the agent has finished replying on the chat page and the conversation
+    has been renamed, instead of sleeping for a fixed time.
+
+    Times are measured from the moment the `/v1/chat/completions` request leaves the
+    browser, or from arming if it is never seen. The reply is complete once that request
+    returns and the chat DOM has been quiet for `quiet_ms`. The rename is seen either in the sidebar heading
+    or in a GraphQL conversations response carrying the new name. If the rename does not
+    show up within `rename_timeout_ms` after the reply, the reply alone counts as done.
+
+    Args:
+        page: Playwright page showing the chat
+        quiet_ms (int): Required time without DOM mutations after the reply
+        timeout_ms (int): Hard cap on the whole wait
+        rename_timeout_ms (int): How long to wait for the rename after the reply
+        poll_ms (int): Interval between checks
+    """
+
+    UNNAMED = ("", "-", "New Conversation")
+
+    def __init__(
+        self,
+        page,
+        quiet_ms=1500,
+        timeout_ms=180000,
+        rename_timeout_ms=30000,
+        poll_ms=250,
+    ):
+        self.page = page
+        self.quiet_ms = quiet_ms
+        self.timeout_ms = timeout_ms
+        self.rename_timeout_ms = rename_timeout_ms
+        self.poll_ms = poll_ms
+        self.started = None
+        self.sent_at = None
+        self.reply_at = None
+        self.reply_status = None
+        self.conversation_id = None
+        self.renamed_at = None
+        self.conversation_name = None
+
+    async def arm(self):
+        """Starts listening, call before sending the message"""
+        self.started = time.monotonic()
+        self.page.on("request", self._on_request)
+        self.page.on("response", self._on_response)
+        await self.page.evaluate(CHAT_OBSERVER_SCRIPT)
+
+    def disarm(self):
+        self.page.remove_listener("request", self._on_request)
+        self.page.remove_listener("response", self._on_response)
+
+    def _on_request(self, request):
+        if (
+            self.sent_at is None
+            and "/v1/chat/completions" in request.url
+            and request.method == "POST"
+        ):
+            self.sent_at = time.monotonic()
+
+    async def _on_response(self, response):
+        try:
+            if "/v1/chat/completions" in response.url:
+                self.reply_status = response.status
+                if response.ok:
+                    body = await response.json()
+                    self.conversation_id = body.get("id")
+                self.reply_at = time.monotonic()
+            elif "/graphql" in response.url and self.conversation_id:
+                body = await response.json()
+                edges = (
+                    (body.get("data") or {}).get("conversations", {}).get("edges", [])
+                )
+                for edge in edges:
+                    if edge.get("id") == self.conversation_id:
+                        self._on_name(edge.get("name"))
+        except Exception as e:
+            logging.debug(f"Ignoring unreadable chat response {response.url}: {e}")
+
+    def _on_name(self, name):
+        if name and name not in self.UNNAMED and self.renamed_at is None:
+            self.conversation_name = name
+            self.renamed_at = time.monotonic()
+
+    async def wait(self):
+        """
+        Waits for the reply and the rename, or until the timeout
+
+        Returns:
+            dict: elapsed, reply and rename times in seconds (None if not seen),
+                the conversation name and whether the wait timed out
+        """
+        timed_out = False
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= (self.sent_at or self.started) + self.timeout_ms / 1000:
+                    timed_out = True
+                    break
+                if self.reply_at is not None:
+                    try:
+                        probe = await self.page.evaluate(CHAT_PROBE)
+                    except Exception:
+                        # Navigating to /chat/<id> after the reply
+                        probe = None
+                    if probe and probe["domQuietMs"] is None:
+                        try:
+                            await self.page.evaluate(CHAT_OBSERVER_SCRIPT)
+                        except Exception:
+                            # Navigated again, the next probe re-arms the new document
+                            pass
+                    elif probe:
+                        self._on_name(probe["conversationName"])
+                        quiet = probe["domQuietMs"] >= self.quiet_ms
+                        rename_overdue = (
+                            now - self.reply_at
+                        ) * 1000 >= self.rename_timeout_ms
+                        if quiet and (self.renamed_at is not None or rename_overdue):
+                            break
+                await asyncio.sleep(self.poll_ms / 1000)
+        finally:
+            self.disarm()
+        start = self.sent_at or self.started
+        result = {
+            "elapsed": time.monotonic() - start,
+            "reply": self.reply_at - start if self.reply_at else None,
+            "rename": self.renamed_at - start if self.renamed_at else None,
+            "conversation_name": self.conversation_name,
+            "timed_out": timed_out,
+        }
+        if timed_out:
+            logging.warning(
+                f"Chat reply not complete after {result['elapsed']:.2f}s (reply status: {self.reply_status})"
+            )
+        elif self.reply_status is not None and self.reply_status >= 400:
+            logging.warning(f"Chat completion request failed with {self.reply_status}")
+        return result
+
+
+def write_narration_track(all_audio_data, all_audio_lengths, output_path):
+    """
+    Writes the narration clips as one track, each padded to the time its screenshot is
+    shown so the narration stays in sync with the video. Failed clips (None) are silent.
+
+    Returns:
+        bool: Whether a track was written, False when no clip was narrated
+    """
+    narrated = [clip for clip in all_audio_data if clip]
+    if not narrated:
+        return False
+    # Use the sample rate from the first audio clip
+    target_sample_rate = narrated[0][1]
+
+    # Resample all audio to match the first clip's sample rate if needed
+    resampled_audio = []
+    for clip, length in zip(all_audio_data, all_audio_lengths):
+        samples = int(round(length * target_sample_rate))
+        if clip is None:
+            resampled_audio.append(np.zeros(samples))
+            continue
+        audio_data, sr = clip
+        if sr != target_sample_rate:
+            # You might need to add a resampling library like librosa here
+            # resampled = librosa.resample(audio_data, orig_sr=sr, target_sr=target_sample_rate)
+            resampled = audio_data  # Placeholder for actual resampling
+        else:
+            resampled = audio_data
+        resampled_audio.append(
+            np.pad(resampled, (0, max(samples - len(resampled), 0)), mode="constant")
+        )
+
+    # Combine the resampled audio
+    combined_audio = np.concatenate(resampled_audio)
+
+    # Write with the correct sample rate
+    sf.write(output_path, combined_audio, target_sample_rate)
+    return True
+
+
+def video_bitrate_cap(max_size_mb, duration):
+    """
+    Works out the video bitrate that fits a report of the given duration in the size
+    budget, keeping a margin for the container and the rate control buffer
+
+    Returns:
+        int: Maximum video bitrate in kbps
+    """
+    budget_kbps = max_size_mb * 1024 * 8 * 0.9 / duration
+    max_video_kbps = int(budget_kbps - AUDIO_BITRATE_KBPS)
+    if max_video_kbps < MIN_VIDEO_BITRATE_KBPS:
+        logging.warning(
+            f"A {duration:.0f}s video cannot fit in {max_size_mb}MB, "
+            f"encoding at the minimum of {MIN_VIDEO_BITRATE_KBPS}kbps"
+        )
+        max_video_kbps = MIN_VIDEO_BITRATE_KBPS
+    return max_video_kbps
+
+
+def dhash(img, hash_size=16):
+    """Difference hash of an image as a flat boolean array of hash_size**2 bits"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return (small[:, 1:] > small[:, :-1]).ravel()
+
+
+def thumbnail(img, width=160):
+    """Grayscale thumbnail of an image, fine enough to still show a changed line of text"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    height = max(round(gray.shape[0] * width / gray.shape[1]), 1)
+    return cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def prepare_verification_image(
+    img,
+    max_edge=VERIFY_MAX_EDGE,
+    image_format=VERIFY_IMAGE_FORMAT,
+    quality=VERIFY_IMAGE_QUALITY,
+    crop=None,
+):
+    """
+    Shrinks a screenshot into a compact data URL for the vision model
+
+    Args:
+        img (numpy.ndarray): Decoded BGR screenshot
+        max_edge (int): Longest edge in pixels after downscaling, 0 keeps the size
+        image_format (str): "webp" or "jpeg"
+        quality (int): Encoder quality from 1 to 100
+        crop (tuple): Optional (x, y, width, height) region to keep
+
+    Returns:
+        str: Base64 data URL of the re-encoded image
+    """
+    if crop:
+        x, y, width, height = (max(int(round(v)), 0) for v in crop)
+        cropped = img[y : y + height, x : x + width]
+        if cropped.size:
+            img = cropped
+    height, width = img.shape[:2]
+    scale = max_edge / max(height, width) if max_edge else 1
+    if scale < 1:
+        img = cv2.resize(
+            img,
+            (max(round(width * scale), 1), max(round(height * scale), 1)),
+            interpolation=cv2.INTER_AREA,
+        )
+    if image_format == "webp":
+        ok, encoded = cv2.imencode(".webp", img, [cv2.IMWRITE_WEBP_QUALITY, quality])
+        mime_type = "image/webp"
+    elif image_format in ("jpeg", "jpg"):
+        ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        mime_type = "image/jpeg"
+    else:
+        raise Exception(f"Unsupported verification image format: {image_format}")
+    if not ok:
+        raise Exception(f"Failed to encode verification image as {image_format}")
+    return (
+        f"data:{mime_type};base64,{base64.b64encode(encoded.tobytes()).decode('ascii')}"
+    )
+
+
+def combine_actions(actions):
+    """Joins the descriptions of merged screenshots into one narration"""
+    return " ".join(
+        action if action.rstrip().endswith((".", "!", "?")) else f"{action.rstrip()}."
+        for action in actions
+    )
+
+
+class FrameIndex:
+    """
+    Perceptual hash index over captured frames to spot near-identical screenshots.
+
+    Two frames are near-duplicates when their difference hashes differ in at most
+    `threshold` bits (out of 256). Consecutive near-duplicates are merged into one
+    report entry with their narration combined. The hash is too coarse to notice a
+    changed line of text, so verification is only skipped when the same check already
+    passed on a frame whose thumbnail matches cell for cell within `verify_tolerance`.
+    A negative threshold disables deduplication.
+
+    Args:
+        threshold (int): Maximum number of differing hash bits for a near-duplicate
+        verify_tolerance (int): Maximum gray level difference of any thumbnail cell
+    """
+
+    def __init__(self, threshold=4, verify_tolerance=8):
+        self.threshold = threshold
+        self.verify_tolerance = verify_tolerance
+        self.keys = {}
+        self.hashes = None
+        self.thumbnails = {}
+        # Frames that passed, per action and crop
+        self.verified = {}
+        self.verifications_skipped = 0
+        self.lock = threading.Lock()
+
+    def add(self, key, img):
+        frame_hash = dhash(img)
+        frame_thumbnail = thumbnail(img)
+        with self.lock:
+            if self.hashes is None:
+                self.hashes = frame_hash[np.newaxis]
+            else:
+                self.hashes = np.vstack([self.hashes, frame_hash])
+            self.keys[key] = len(self.hashes) - 1
+            self.thumbnails[key] = frame_thumbnail
+
+    def similar(self, a, b):
+        if self.threshold < 0 or a not in self.keys or b not in self.keys:
+            return False
+        distance = np.count_nonzero(
+            self.hashes[self.keys[a]] != self.hashes[self.keys[b]]
+        )
+        return distance <= self.threshold
+
+    def identical(self, a, b):
+        """Stricter than similar, every thumbnail cell has to match within verify_tolerance"""
+        with self.lock:
+            first, second = self.thumbnails.get(a), self.thumbnails.get(b)
+        if first is None or second is None or first.shape != second.shape:
+            return False
+        difference = cv2.absdiff(first, second)
+        return int(difference.max()) <= self.verify_tolerance
+
+    def find_verified(self, key, action_name, crop=None):
+        """Returns a frame that passed the same check and is identical to key, or None"""
+        if self.threshold < 0:
+            return None
+        for verified in self.verified.get((action_name, crop), []):
+            if self.identical(key, verified):
+                return verified
+        return None
+
+    def mark_verified(self, key, action_name, crop=None):
+        self.verified.setdefault((action_name, crop), []).append(key)
+
+    def group(self, screenshots_with_actions):
+        """
+        Merges runs of consecutive near-duplicate screenshots, keeping the last frame
+        of each run and combining their actions
+
+        Returns:
+            list: (screenshot path, list of actions) per report entry
+        """
+        groups = []
+        for screenshot_path, action_name in screenshots_with_actions:
+            if groups and self.similar(groups[-1][0], screenshot_path):
+                groups[-1] = (screenshot_path, groups[-1][1] + [action_name])
+            else:
+                groups.append((screenshot_path, [action_name]))
+        return groups
+
+    def log_savings(self, screenshots, entries):
+        merged = screenshots - entries
+        logging.info(
+            f"Deduplication merged {merged} of {screenshots} screenshots, saving "
+            f"{merged} TTS clips and at least {merged * 2}s of video, and skipped "
+            f"{self.verifications_skipped} verifications"
+        )
+
+
+class FrameStore:
+    """
+    Keeps captured screenshots in memory so capture, verification and encoding share
+    one copy and one decode per screenshot instead of writing and re-reading PNGs.
+
+    Frames are keyed by the path they would be saved at. Decoded arrays are made on
+    first use and kept. Once the store holds more than `max_bytes`, the oldest decoded
+    arrays are dropped first, then the oldest PNGs are spilled to their path on disk
+    and read back from there when needed.
+
+    Args:
+        max_bytes (int): Memory cap for PNG bytes and decoded arrays together
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.png = {}
+        self.arrays = {}
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self.png or os.path.exists(key)
+
+    def add(self, key, png_bytes):
+        with self.lock:
+            self.png[key] = png_bytes
+            self._enforce_limit()
+
+    def get_bytes(self, key):
+        with self.lock:
+            png_bytes = self.png.get(key)
+        if png_bytes is None:
+            with open(key, "rb") as f:
+                png_bytes = f.read()
+        return png_bytes
+
+    def get_array(self, key):
+        """Returns the decoded BGR image, or None if the frame is unknown"""
+        with self.lock:
+            img = self.arrays.get(key)
+        if img is not None:
+            return img
+        try:
+            png_bytes = self.get_bytes(key)
+        except OSError:
+            return None
+        img = cv2.imdecode(np.frombuffer(png_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if img is not None:
+            with self.lock:
+                self.arrays[key] = img
+                self._enforce_limit()
+        return img
+
+    def memory_used(self):
+        return sum(len(png) for png in self.png.values()) + sum(
+            img.nbytes for img in self.arrays.values()
+        )
+
+    def _enforce_limit(self):
+        used = self.memory_used()
+        # Dicts keep insertion order, so the first keys are the oldest frames
+        for key in list(self.arrays):
+            if used <= self.max_bytes:
+                return
+            used -= self.arrays.pop(key).nbytes
+        for key in list(self.png):
+            if used <= self.max_bytes:
+                return
+            used -= len(self.png[key])
+            self._spill(key)
+
+    def _spill(self, key):
+        png_bytes = self.png.pop(key)
+        if not os.path.exists(key):
+            os.makedirs(os.path.dirname(key) or ".", exist_ok=True)
+            with open(key, "wb") as f:
+                f.write(png_bytes)
+
+    def spill_all(self):
+        """Writes every in-memory frame to disk, e.g. before handing them to another process"""
+        with self.lock:
+            for key in list(self.png):
+                self._spill(key)
+            self.arrays.clear()
+
+
+class FrameRing:
+    """
+    Ring buffer of the last `size` screenshots and their actions, used in fast mode.
+
+    Passing runs only ever hold these in memory and drop the oldest frame for every new
+    one. When a run fails the buffer is drained into named frames, so the moments that
+    led up to the failure can still be saved and reported.
+
+    Args:
+        size (int): Number of frames to keep
+    """
+
+    def __init__(self, size=20):
+        self.buffer = collections.deque(maxlen=size)
+        self.captured = 0
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def add(self, action_name, png_bytes):
+        self.buffer.append(
+            (
+                self.captured,
+                datetime.now().strftime("%Y%m%d_%H%M%S"),
+                action_name,
+                png_bytes,
+            )
+        )
+        self.captured += 1
+
+    def drain(self, directory):
+        """
+        Empties the buffer
+
+        Returns:
+            list: (path, action, png bytes) of the buffered frames, oldest first
+        """
+        frames = []
+        while self.buffer:
+            index, timestamp, action_name, png_bytes = self.buffer.popleft()
+            sanitized_action_name = re.sub(r"[^a-zA-Z0-9_-]", "_", action_name)
+            path = os.path.join(
+                directory, f"{index:03d}_{timestamp}_{sanitized_action_name}.png"
+            )
+            frames.append((path, action_name, png_bytes))
+        return frames
+
+
+class ReportPipeline:
+    """
+    Builds the video report incrementally while the test is still running.
+
+    Every submitted screenshot is narrated straight away on a thread pool and then
+    encoded into its own short H.264 segment by a single background encoder, so when
+    the run ends only the concatenation of the segments and the audio mux are left.
+
+    Args:
+        test (FrontEndTest): Test whose narrate_or_silence() produces the clips
+        fps (int): Frame rate of the segments
+        crf (int): Quality of the segments
+    """
+
+    def __init__(self, test, fps=30, crf=23):
+        self.test = test
+        self.fps = fps
+        self.crf = crf
+        self.temp_dir = None
+        self.size = None
+        self.segments = []
+        self.children = []
+        self.pending = None
+        # Screenshots submitted, including ones merged into a segment as near-duplicates
+        self.covered = 0
+        self.finished = False
+        self.result = None
+        self.narration_pool = ThreadPoolExecutor(max_workers=NARRATION_CONCURRENCY)
+        # A single encoder keeps segments in order and leaves CPU for the browser
+        self.encode_pool = ThreadPoolExecutor(max_workers=1)
+
+    def _temp_dir(self):
+        # Only made once there is something to write, runs without a report leave nothing
+        if self.temp_dir is None:
+            self.temp_dir = tempfile.mkdtemp()
+        return self.temp_dir
+
+    def submit(self, screenshot_path, action_name):
+        self.covered += 1
+        # Hold the latest screenshot back until the next one shows whether it is a
+        # near-duplicate that should share its segment
+        if self.pending and self.test.frame_index.similar(
+            self.pending[0], screenshot_path
+        ):
+            self.pending = (screenshot_path, self.pending[1] + [action_name])
+            return
+        self.flush()
+        self.pending = (screenshot_path, [action_name])
+
+    def flush(self):
+        if not self.pending:
+            return
+        screenshot_path, actions = self.pending
+        self.pending = None
+        idx = len(self.segments)
+        narration = self.narration_pool.submit(
+            self.test.narrate_or_silence, idx, combine_actions(actions)
+        )
+        self.segments.append(
+            self.encode_pool.submit(
+                self._encode_segment, idx, screenshot_path, narration
+            )
+        )
+
+    @classmethod
+    def merge(cls, test, pipelines):
+        """Combines the pipelines of several tests, in order, into one"""
+        merged = cls(test)
+        merged.children = list(pipelines)
+        for pipeline in pipelines:
+            pipeline.flush()
+            merged.segments.extend(pipeline.segments)
+            merged.covered += pipeline.covered
+        return merged
+
+    def _close(self, cancel=False):
+        for pipeline in [self] + self.children:
+            pipeline.narration_pool.shutdown(cancel_futures=cancel)
+            pipeline.encode_pool.shutdown(cancel_futures=cancel)
+            if pipeline.test.narration_cache:
+                pipeline.test.narration_cache.save()
+
+    def _cleanup(self):
+        for pipeline in [self] + self.children:
+            if pipeline.temp_dir:
+                shutil.rmtree(pipeline.temp_dir, ignore_errors=True)
+
+    def discard(self):
+        """Stops the pipeline and removes its segments when the report is built another way"""
+        if self.finished:
+            return
+        self.finished = True
+        self._close(cancel=True)
+        self._cleanup()
+
+    def _encode_segment(self, idx, screenshot_path, narration):
+        clip = narration.result()
+        # Every screenshot stays on screen for at least 2 seconds
+        length = max(len(clip[0]) / clip[1], 2.0) if clip else 2.0
+        frames = max(round(length * self.fps), 1)
+        img = self.test.frames.get_array(screenshot_path)
+        if img is None:
+            raise Exception(f"Failed to read screenshot: {screenshot_path}")
+        if self.size is None:
+            self.size = (img.shape[1], img.shape[0])
+        elif (img.shape[1], img.shape[0]) != self.size:
+            # Segments can only be joined without re-encoding if they match
+            img = cv2.resize(img, self.size)
+        with self.test.tracer.span(
+            "report", f"Encoding segment {idx}", lane="report encoder"
+        ):
+            segment_path = os.path.join(self._temp_dir(), f"segment_{idx:04d}.mp4")
+            subprocess.run(
+                [
+                    "ffmpeg",
+                    "-f",
+                    "rawvideo",
+                    "-pix_fmt",
+                    "bgr24",
+                    "-s",
+                    f"{self.size[0]}x{self.size[1]}",
+                    "-framerate",
+                    str(self.fps),
+                    "-i",
+                    "pipe:0",
+                    # Hold the single frame for the whole narration
+                    "-vf",
+                    f"loop=loop={frames - 1}:size=1:start=0,pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                    "-c:v",
+                    "libx264",
+                    "-pix_fmt",
+                    "yuv420p",
+                    "-crf",
+                    str(self.crf),
+                    "-preset",
+                    "medium",
+                    segment_path,
+                    "-y",
+                    "-loglevel",
+                    "error",
+                ],
+                input=img.tobytes(),
+                capture_output=True,
+                check=True,
+            )
+        # The segment is a whole number of frames, the audio is padded to match
+        return segment_path, clip, frames / self.fps
+
+    def finish(self, output_path, max_size_mb):
+        """
+        Joins the segments and muxes in the narration. Segments are encoded before the
+        length of the run is known, so when the joined report is over the size limit
+        only its video stream is re-encoded, capped to the bitrate that fits.
+
+        Returns:
+            str: Path of the report, or None if the segments could not be joined
+        """
+        # A second call, e.g. from the failure path, must not touch the removed segments
+        if self.finished:
+            return self.result
+        self.finished = True
+        self.flush()
+        self.test.frame_index.log_savings(self.covered, len(self.segments))
+        try:
+            segments = [segment.result() for segment in self.segments]
+        except Exception as e:
+            logging.error(f"Incremental report segment failed: {e}")
+            self._cleanup()
+            return None
+        finally:
+            self._close()
+        audio_path = os.path.join(self._temp_dir(), "combined_audio.wav")
+        has_audio = write_narration_track(
+            [clip for _, clip, _ in segments],
+            [length for _, _, length in segments],
+            audio_path,
+        )
+        joined_path = os.path.join(self._temp_dir(), "joined.mp4")
+        with self.test.tracer.span("report", "Joining segments", lane="report"):
+            list_path = os.path.join(self._temp_dir(), "segments.txt")
+            with open(list_path, "w") as f:
+                for segment_path, _, _ in segments:
+                    f.write(f"file '{segment_path}'\n")
+            command = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", list_path]
+            if has_audio:
+                command += ["-i", audio_path]
+            command += [
+                "-c:v",
+                "copy",
+                "-c:a",
+                "aac",
+                "-b:a",
+                f"{AUDIO_BITRATE_KBPS}k",
+                joined_path,
+                "-y",
+                "-loglevel",
+                "error",
+            ]
+            joined = subprocess.run(command, capture_output=True)
+        try:
+            if joined.returncode != 0 or not os.path.exists(joined_path):
+                logging.error(
+                    f"Failed to join the incremental report segments: {joined.stderr.decode(errors='replace')}"
+                )
+                return None
+            size_mb = os.path.getsize(joined_path) / (1024 * 1024)
+            if size_mb <= max_size_mb:
+                shutil.move(joined_path, output_path)
+            else:
+                duration = sum(length for _, _, length in segments)
+                max_video_kbps = video_bitrate_cap(max_size_mb, duration)
+                logging.info(
+                    f"Incremental report ({size_mb:.2f}MB) exceeds limit of {max_size_mb}MB, "
+                    f"re-encoding its video capped at {max_video_kbps}kbps"
+                )
+                with self.test.tracer.span(
+                    "report",
+                    "Capping video bitrate",
+                    lane="report",
+                    kbps=max_video_kbps,
+                ):
+                    capped = subprocess.run(
+                        [
+                            "ffmpeg",
+                            "-i",
+                            joined_path,
+                            "-c:v",
+                            "libx264",
+                            "-pix_fmt",
+                            "yuv420p",
+                            "-crf",
+                            str(self.crf),
+                            "-maxrate",
+                            f"{max_video_kbps}k",
+                            "-bufsize",
+                            f"{max_video_kbps * 2}k",
+                            "-preset",
+                            "medium",
+                            # The narration is already encoded, only the video shrinks
+                            "-c:a",
+                            "copy",
+                            output_path,
+                            "-y",
+                            "-loglevel",
+                            "error",
+                        ],
+                        capture_output=True,
+                    )
+                if capped.returncode != 0:
+                    logging.error(
+                        f"Failed to re-encode the incremental report: {capped.stderr.decode(errors='replace')}"
+                    )
+                    return None
+        finally:
+            self._cleanup()
+        self.result = output_path
+        return output_path
+
+
+class NarrationCache:
+    """
+    Content-addressed on-disk cache of TTS narration clips.
+
+    Clips are keyed by a hash of the model, voice, language and cleaned action text and
+    stored as decoded samples alongside their sample rate and duration. The least
+    recently used clips are evicted once the cache grows past `max_bytes`.
+
+    Args:
+        cache_dir (str): Directory to keep the clips in
+        max_bytes (int): Size limit of the cache
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir or os.path.join(
+            "test_screenshots", ".narration_cache"
+        )
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self.index = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(model, voice, language, text):
+        return hashlib.sha256(
+            "\0".join([model, voice, language, text]).encode("utf-8")
+        ).hexdigest()
+
+    def _load_index(self):
+        if self.index is not None:
+            return
+        try:
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+        # Drop entries whose clip was removed behind our back
+        self.index = {
+            key: entry
+            for key, entry in self.index.items()
+            if os.path.exists(self._path(key))
+        }
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key):
+        """Returns the cached (samples, sample rate) for the key, or None"""
+        with self.lock:
+            self._load_index()
+            entry = self.index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                audio_data = np.load(self._path(key))
+            except (OSError, ValueError):
+                del self.index[key]
+                self.misses += 1
+                return None
+            entry["last_used"] = time.time()
+            self.hits += 1
+            return audio_data, entry["sample_rate"]
+
+    def put(self, key, audio_data, sample_rate):
+        with self.lock:
+            self._load_index()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+            np.save(temp_path, audio_data)
+            os.replace(temp_path, path)
+            self.index[key] = {
+                "sample_rate": sample_rate,
+                "duration": len(audio_data) / sample_rate,
+                "size": os.path.getsize(path),
+                "last_used": time.time(),
+            }
+            self._evict()
+
+    def _evict(self):
+        total = sum(entry["size"] for entry in self.index.values())
+        for key, entry in sorted(
+            self.index.items(), key=lambda item: item[1]["last_used"]
+        ):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            total -= entry["size"]
+            del self.index[key]
+            self.evictions += 1
+
+    def save(self):
+        """Writes the index back to disk and logs the hit rate"""
+        with self.lock:
+            if self.index is None:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self.index, f)
+            os.replace(temp_path, self.index_path)
+        logging.info(
+            f"Narration cache: {self.hits} hits, {self.misses} misses, "
+            f"{self.evictions} evicted, {len(self.index)} clips cached"
+        )
+
+
+class AGiXTClient:
+    """
+    Async AGiXT API client sharing one pool of keep-alive connections.
+
+    A throwaway user is registered on first use rather than on construction, so tests
+    that never call the API never pay for it. Concurrent first calls register once.
+
+    Args:
+        base_uri (str): AGiXT API to talk to, defaults to AGIXT_URI
+        timeout (float): Seconds a single request may take
+        max_connections (int): Size of the connection pool
+    """
+
+    def __init__(self, base_uri=None, timeout=AGIXT_TIMEOUT, max_connections=10):
+        self.base_uri = (base_uri or AGIXT_URI).rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.client = None
+        self.headers = None
+        self.lock = None
+
+    def _client(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_uri,
+                timeout=httpx.Timeout(self.timeout, connect=10),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self.client
+
+    async def _post(self, path, payload, headers=None):
+        response = await self._client().post(path, json=payload, headers=headers)
+        if response.status_code >= 400:
+            raise Exception(
+                f"AGiXT request to {path} failed with {response.status_code}: {response.text}"
+            )
+        return response.json()
+
+    async def register(self):
+        """Registers a new user and logs in, once, on first use"""
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            if self.headers:
+                return
+            start = time.monotonic()
+            email = f"{uuid.uuid4()}@example.com"
+            response = await self._post(
+                "/v1/user",
+                {"email": email, "first_name": "Test", "last_name": "User"},
+            )
+            otp_uri = response.get("otp_uri", "")
+            match = re.search(r"secret=([\w\d]+)", otp_uri)
+            if not match:
+                raise Exception(f"Failed to register AGiXT user: {response}")
+            response = await self._post(
+                "/v1/login",
+                {"email": email, "token": await fresh_totp(match.group(1), 2)},
+            )
+            detail = response.get("detail", "")
+            if "?token=" not in detail:
+                raise Exception(f"Failed to log in AGiXT user: {response}")
+            self.headers = {"Authorization": detail.split("token=")[1]}
+            logging.info(
+                f"Registered AGiXT user {email} in {time.monotonic() - start:.2f}s"
+            )
+
+    async def prompt_agent(self, agent_name, prompt_name, prompt_args):
+        await self.register()
+        response = await self._post(
+            f"/api/agent/{agent_name}/prompt",
+            {"prompt_name": prompt_name, "prompt_args": prompt_args},
+            headers=self.headers,
+        )
+        return response["response"]
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+class VerificationQueue:
+    """
+    Verifies screenshots with the agent in the background while the test carries on.
+
+    Checks run concurrently up to `concurrency` at a time. Verdicts are cached by a hash
+    of the screenshot and the action text so an identical check is only asked once, and
+    failures are collected to be reported when the run ends rather than failing the step.
+
+    Args:
+        test (FrontEndTest): Test whose prompt_agent performs the checks
+        concurrency (int): Maximum number of checks in flight at once
+    """
+
+    def __init__(self, test, concurrency=VERIFY_CONCURRENCY):
+        self.test = test
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.tasks = []
+        self.verdicts = {}
+        self.failures = []
+        self.hits = 0
+
+    @staticmethod
+    def key(png_bytes, action_name, crop=None):
+        return hashlib.sha256(
+            png_bytes + b"\0" + f"{action_name}\0{crop}".encode("utf-8")
+        ).hexdigest()
+
+    def submit(self, action_name, screenshot_path, crop=None):
+        self.tasks.append(
+            asyncio.ensure_future(self._verify(action_name, screenshot_path, crop))
+        )
+
+    async def _verify(self, action_name, screenshot_path, crop=None):
+        key = self.key(self.test.frames.get_bytes(screenshot_path), action_name, crop)
+        if key in self.verdicts:
+            self.hits += 1
+        else:
+            self.verdicts[key] = asyncio.ensure_future(
+                self._check(action_name, screenshot_path, crop)
+            )
+        error = await self.verdicts[key]
+        if error:
+            self.failures.append(f"{action_name}: {error}")
+
+    async def _check(self, action_name, screenshot_path, crop=None):
+        async with self.semaphore:
+            try:
+                await self.test.prompt_agent(action_name, screenshot_path, crop)
+                return None
+            except Exception as e:
+                logging.error(f"Verification failed for {action_name}: {e}")
+                return str(e)
+
+    async def drain(self):
+        """
+        Waits for every queued check to finish
+
+        Returns:
+            list: Failed checks
+        """
+        if self.tasks:
+            await asyncio.gather(*self.tasks)
+            logging.info(
+                f"Verified {len(self.tasks)} screenshots, {len(self.failures)} failed, "
+                f"{self.hits} answered from cache"
+            )
+        self.tasks = []
+        return self.failures
+
+    def cancel(self):
+        for task in self.tasks:
+            task.cancel()
+        for verdict in self.verdicts.values():
+            verdict.cancel()
+        self.tasks = []
+
+
+class AuthSessionCache:
+    """
+    Caches signed in sessions so scenarios and later runs can skip sign up and MFA.
+
+    Each entry holds the Playwright storage state (cookies and localStorage) together
+    with the user's email and MFA secret, keyed by base URI and user. Entries older than
+    `max_age` seconds or whose `jwt` cookie has expired are treated as stale.
+
+    Args:
+        cache_dir (str): Directory to keep the entries in
+        max_age (int): Maximum age of an entry in seconds
+    """
+
+    def __init__(self, cache_dir=None, max_age=6 * 3600):
+        self.cache_dir = cache_dir or os.path.join("test_screenshots", ".auth_cache")
+        self.max_age = max_age
+
+    def _path(self, base_uri, user):
+        key = hashlib.sha256(f"{base_uri}|{user}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load(self, base_uri, user):
+        """Returns the cached entry, or None if there is none or it is stale"""
+        path = self._path(base_uri, user)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        now = time.time()
+        if now - entry.get("saved_at", 0) > self.max_age:
+            logging.info(f"Cached session for {user} at {base_uri} is too old")
+            return None
+        jwt = [
+            cookie
+            for cookie in entry["storage_state"].get("cookies", [])
+            if cookie.get("name") == "jwt" and cookie.get("value")
+        ]
+        # Session cookies report -1, anything else must still be valid for a while
+        if not jwt or any(0 <= cookie["expires"] < now + 60 for cookie in jwt):
+            logging.info(f"Cached session for {user} at {base_uri} has expired")
+            return None
+        return entry
+
+    def save(self, base_uri, user, email, mfa_token, storage_state):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(base_uri, user)
+        entry = {
+            "base_uri": base_uri,
+            "user": user,
+            "email": email,
+            "mfa_token": mfa_token,
+            "saved_at": time.time(),
+            "storage_state": storage_state,
+        }
+        # Write then rename so parallel workers never read a partial entry
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(temp_path, path)
+        logging.info(f"Cached session for {user} at {base_uri}")
+
+    def invalidate(self, base_uri, user):
+        try:
+            os.remove(self._path(base_uri, user))
+        except FileNotFoundError:
+            pass
+
+
+class BrowserServer:
+    """
+    Long-lived Chromium started with `playwright launch-server` and shared across runs.
+
+    The server's websocket endpoint and process id are kept in a state file, so later
+    runs and sharded workers connect to the already warm browser instead of launching
+    their own, and every test still gets fresh isolated contexts. A server that does
+    not answer (or runs in the wrong headless mode) is replaced by a new one, and a
+    lock file keeps concurrent workers from starting several.
+
+    Args:
+        state_file (str): JSON file holding the endpoint and process id
+        connect_timeout_ms (int): How long a single connection attempt may take
+        startup_timeout (float): Seconds to wait for a newly started server
+    """
+
+    def __init__(self, state_file=None, connect_timeout_ms=5000, startup_timeout=60):
+        self.state_file = state_file or os.path.join(
+            "test_screenshots", ".browser_server.json"
+        )
+        self.connect_timeout_ms = connect_timeout_ms
+        self.startup_timeout = startup_timeout
+
+    def _load_state(self):
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            # Reaps the server if this process started it and it already exited
+            if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                return False
+        except (ChildProcessError, AttributeError):
+            pass
+        try:
+            os.kill(pid, 0)
+            return True
+        except OSError:
+            return False
+
+    def _spawn(self, headless):
+        """Starts a new server process detached from this run and records its state"""
+        state = self._load_state()
+        if state and self._alive(state["pid"]):
+            logging.info(f"Stopping unhealthy browser server {state['pid']}")
+            self.stop(state)
+        directory = os.path.dirname(os.path.abspath(self.state_file))
+        os.makedirs(directory, exist_ok=True)
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        ws_path = uuid.uuid4().hex
+        config_path = os.path.join(directory, "browser_server_config.json")
+        with open(config_path, "w") as f:
+            json.dump(
+                {
+                    "headless": headless,
+                    "port": port,
+                    "host": "127.0.0.1",
+                    "wsPath": ws_path,
+                },
+                f,
+            )
+        with open(os.path.join(directory, "browser_server.log"), "ab") as log:
+            process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "playwright",
+                    "launch-server",
+                    "--browser",
+                    "chromium",
+                    "--config",
+                    config_path,
+                ],
+                stdout=log,
+                stderr=log,
+                # Outlives this run so the next one finds it warm
+                start_new_session=True,
+            )
+        state = {
+            "ws_endpoint": f"ws://127.0.0.1:{port}/{ws_path}",
+            "pid": process.pid,
+            "headless": headless,
+            "started": time.time(),
+        }
+        temp_path = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_file)
+        logging.info(f"Started browser server {process.pid} at {state['ws_endpoint']}")
+        return state
+
+    async def _connect(self, playwright, state, quiet=False):
+        try:
+            return await playwright.chromium.connect(
+                state["ws_endpoint"], timeout=self.connect_timeout_ms
+            )
+        except Exception as e:
+            if not quiet:
+                logging.info(
+                    f"Browser server at {state['ws_endpoint']} unavailable: {e}"
+                )
+            return None
+
+    @contextlib.asynccontextmanager
+    async def _lock(self):
+        # Only one worker at a time may replace the server. The lock is polled rather
+        # than waited for, a blocking flock would stall the event loop and with it the
+        # task holding the lock
+        directory = os.path.dirname(os.path.abspath(self.state_file))
+        os.makedirs(directory, exist_ok=True)
+        with open(f"{self.state_file}.lock", "w") as lock:
+            try:
+                import fcntl
+            except ImportError:
+                fcntl = None
+            while fcntl:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(0.1)
+            yield
+
+    async def connect(self, playwright, headless=True):
+        """
+        Connects to the warm browser, starting or replacing the server when needed
+
+        Returns:
+            Browser: A browser connected to the server
+        """
+        start = time.monotonic()
+        state = self._load_state()
+        if state and state.get("headless") == headless and self._alive(state["pid"]):
+            browser = await self._connect(playwright, state)
+            if browser:
+                logging.info(
+                    f"Connected to warm browser server in {time.monotonic() - start:.3f}s"
+                )
+                return browser
+        async with self._lock():
+            # Another worker may have replaced it while we waited for the lock
+            state = self._load_state()
+            browser = None
+            if (
+                state
+                and state.get("headless") == headless
+                and self._alive(state["pid"])
+            ):
+                browser = await self._connect(playwright, state)
+            if not browser:
+                state = await asyncio.to_thread(self._spawn, headless)
+                deadline = time.monotonic() + self.startup_timeout
+                while not browser:
+                    if not self._alive(state["pid"]):
+                        raise Exception(
+                            "Browser server exited on startup, see browser_server.log"
+                        )
+                    if time.monotonic() >= deadline:
+                        raise Exception(
+                            f"Browser server did not start within {self.startup_timeout}s"
+                        )
+                    await asyncio.sleep(0.25)
+                    browser = await self._connect(playwright, state, quiet=True)
+        logging.info(f"Connected to browser server in {time.monotonic() - start:.2f}s")
+        return browser
+
+    def stop(self, state=None):
+        """Stops the server process"""
+        state = state or self._load_state()
+        if not state:
+            return
+        try:
+            os.killpg(state["pid"], signal.SIGTERM)
+        except (OSError, AttributeError):
+            try:
+                os.kill(state["pid"], signal.SIGTERM)
+            except OSError:
+                pass
+
+
+class SpanTracer:
+    """
+    Records how long each step of a run takes as monotonic spans.
+
+    Spans carry a category, a name (usually the action description), the lane they ran
+    on (a scenario or a worker thread) and their outcome. They are written as a JSONL
+    step log and as a Chrome trace-event file that can be opened in Perfetto.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, category, name, lane="main", **args):
+        """
+        Times the enclosed block, recording an error outcome if it raises
+
+        Yields:
+            dict: Extra arguments to attach to the span
+        """
+        start = time.monotonic()
+        outcome = "ok"
+        try:
+            yield args
+        except BaseException as e:
+            outcome = f"error: {e}"
+            raise
+        finally:
+            with self.lock:
+                self.spans.append(
+                    {
+                        "category": category,
+                        "name": name,
+                        "lane": lane,
+                        "start": start,
+                        "duration": time.monotonic() - start,
+                        "outcome": outcome,
+                        "pid": os.getpid(),
+                        "args": args,
+                    }
+                )
+
+    def write(self, directory):
+        """
+        Writes the step log and the trace file into the directory
+
+        Returns:
+            tuple: Paths of the JSONL step log and the Chrome trace file
+        """
+        os.makedirs(directory, exist_ok=True)
+        spans = sorted(self.spans, key=lambda span: span["start"])
+        origin = spans[0]["start"] if spans else 0
+        log_path = os.path.join(directory, "steps.jsonl")
+        with open(log_path, "w") as f:
+            for span in spans:
+                f.write(
+                    json.dumps({**span, "start": span["start"] - origin}, default=str)
+                    + "\n"
+                )
+        lanes = {}
+        events = []
+        for span in spans:
+            tid = lanes.setdefault((span["pid"], span["lane"]), len(lanes) + 1)
+            events.append(
+                {
+                    "name": span["name"],
+                    "cat": span["category"],
+                    "ph": "X",
+                    "ts": round((span["start"] - origin) * 1e6),
+                    "dur": round(span["duration"] * 1e6),
+                    "pid": span["pid"],
+                    "tid": tid,
+                    "args": {"outcome": span["outcome"], **span["args"]},
+                }
+            )
+        for (pid, lane), tid in lanes.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": lane},
+                }
+            )
+        trace_path = os.path.join(directory, "trace.json")
+        with open(trace_path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+        logging.info(f"Wrote step log to {log_path} and trace to {trace_path}")
+        return log_path, trace_path
+
+    def summary(self, limit=10):
+        """Logs the slowest steps and the total time spent per category"""
+        totals = {}
+        for span in self.spans:
+            totals[span["category"]] = (
+                totals.get(span["category"], 0) + span["duration"]
+            )
+        steps = sorted(
+            (span for span in self.spans if span["category"] == "step"),
+            key=lambda span: span["duration"],
+            reverse=True,
+        )
+        lines = [f"Slowest {min(limit, len(steps))} of {len(steps)} steps:"]
+        for span in steps[:limit]:
+            lines.append(
+                f"  {span['duration']:7.2f}s [{span['lane']}] {span['name'][:80]}"
+                + ("" if span["outcome"] == "ok" else f" ({span['outcome'][:60]})")
+            )
+        lines.append(
+            "Time per category: "
+            + ", ".join(
+                f"{category} {total:.1f}s"
+                for category, total in sorted(
+                    totals.items(), key=lambda item: item[1], reverse=True
+                )
+            )
+        )
+        logging.info("\n".join(lines))
+
+
 class FrontEndTest:
 
     def __init__(
         self,
         base_uri: str = "http://localhost:3437",
         features: str = "",
+        readiness: dict = None,
+        screenshots_dir: str = None,
+        auth_cache: AuthSessionCache = None,
+        frames: FrameStore = None,
+        frame_index: FrameIndex = None,
+        verification: VerificationQueue = None,
+        agixt: AGiXTClient = None,
+        tracer: SpanTracer = None,
+        lane: str = "main",
+        vitals: WebVitalsCollector = None,
+        screenshots: bool = True,
+        browser_server: BrowserServer = None,
+        resources: ResourcePolicy = None,
+        fast: bool = None,
     ):
         self.base_uri = base_uri
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.screenshots_dir = os.path.join("test_screenshots", f"test_run_{timestamp}")
+        self.screenshots_dir = screenshots_dir or os.path.join(
+            "test_screenshots", f"test_run_{timestamp}"
+        )
         os.makedirs(self.screenshots_dir, exist_ok=True)
         self.browser = None
         self.context = None
@@ -61,14 +2173,52 @@ class FrontEndTest:
         self.popup = None
         self.playwright = None
         self.screenshots_with_actions = []
-        self.agixt = AGiXTSDK(base_uri="https://api.agixt.dev")
-        self.agixt.register_user(
-            email=f"{uuid.uuid4()}@example.com", first_name="Test", last_name="User"
+        # Keyword arguments for PageReadiness, e.g. {"dom_quiet_ms": 1000, "max_wait_ms": 30000}
+        self.readiness_settings = readiness or {}
+        self.readiness = {}
+        self.step_timings = []
+        self.scenario_results = {}
+        self.screenshots_by_scenario = {}
+        self.auth_cache = auth_cache
+        self.report_pipeline = None
+        # Screenshots stay in memory up to FRAME_STORE_MB and are spilled to disk past it
+        self.frames = frames or FrameStore(
+            int(os.getenv("FRAME_STORE_MB", "512")) * 1024 * 1024
+        )
+        # Screenshots within DEDUP_THRESHOLD hash bits of the previous one are merged
+        # in the report, a negative threshold turns deduplication off
+        self.frame_index = frame_index or FrameIndex(
+            int(os.getenv("DEDUP_THRESHOLD", "4"))
+        )
+        # Set NARRATION_CACHE_DIR to an empty string to always synthesize narration
+        narration_cache_dir = os.environ.get("NARRATION_CACHE_DIR")
+        self.narration_cache = (
+            NarrationCache(narration_cache_dir) if narration_cache_dir != "" else None
+        )
+        self.agixt = agixt or AGiXTClient()
+        # Spans of every step end up in steps.jsonl and trace.json next to the screenshots
+        self.tracer = tracer or SpanTracer()
+        self.lane = lane
+        self.vitals = vitals or WebVitalsCollector()
+        # Load runs switch screenshots off, take_screenshot then returns None
+        self.screenshots = screenshots
+        self.browser_server = browser_server
+        # Scenarios that find the browser gone reconnect one at a time
+        self.browser_lock = asyncio.Lock()
+        # RESOURCE_POLICY=lean or minimal blocks assets logic-only runs do not need
+        self.resources = resources or ResourcePolicy.from_env(base_uri)
+        # FAST_MODE=true keeps only the last FAST_MODE_FRAMES screenshots in memory and
+        # saves them, with a short report, only when the run fails
+        if fast is None:
+            fast = os.getenv("FAST_MODE", "false") == "true"
+        self.ring = (
+            FrameRing(int(os.getenv("FAST_MODE_FRAMES", "20"))) if fast else None
         )
         # Features are comma separated, options are:
         # - stripe
         # - email
         # - google
+        # - verify
         if features == "":
             features = os.environ.get("features", "")
         if features == "":
@@ -82,38 +2232,167 @@ class FrontEndTest:
         else:
             if features != "":
                 self.features = [features]
+        if self.ring is not None and "verify" in self.features:
+            logging.warning("Screenshots are not verified in fast mode")
+        self.verification = verification or VerificationQueue(self)
+
+    async def wait_until_settled(self, target=None):
+        """
+        Waits for the popup (if any) or the page to settle
+
+        Returns:
+            float: Seconds actually waited
+        """
+        target = target or (self.popup if self.popup else self.page)
+        return await self.readiness_for(target).wait()
+
+    def readiness_for(self, target):
+        if target not in self.readiness:
+            self.readiness[target] = PageReadiness(target, **self.readiness_settings)
+        return self.readiness[target]
 
     async def take_screenshot(self, action_name, no_sleep=False):
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        sanitized_action_name = re.sub(r"[^a-zA-Z0-9_-]", "_", action_name)
-        screenshot_path = os.path.join(
-            self.screenshots_dir, f"{timestamp}_{sanitized_action_name}.png"
-        )
-        logging.info(
-            f"[{timestamp}] Action: {action_name} - Screenshot path: {screenshot_path}"
-        )
+        if not self.screenshots:
+            return None
+        if self.ring is not None:
+            return await self.buffer_screenshot(action_name)
+        with self.tracer.span("screenshot", action_name, lane=self.lane):
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            sanitized_action_name = re.sub(r"[^a-zA-Z0-9_-]", "_", action_name)
+            # The sequence number keeps repeated actions within the same second apart
+            screenshot_path = os.path.join(
+                self.screenshots_dir,
+                f"{len(self.screenshots_with_actions):03d}_{timestamp}_{sanitized_action_name}.png",
+            )
+            logging.info(
+                f"[{timestamp}] Action: {action_name} - Screenshot path: {screenshot_path}"
+            )
+            target = self.popup if self.popup else self.page
+            logging.info(
+                f"Screenshotting { 'popup' if self.popup else 'page'} at {target.url}"
+            )
+            if not no_sleep:
+                waited = await self.wait_until_settled(target)
+                logging.info(f"Page settled after {waited:.2f}s")
+            if target == self.page:
+                await self.vitals.collect(self.page, action_name, self.lane)
+
+            png_bytes = await target.screenshot()
+
+            if not png_bytes:
+                raise Exception(
+                    f"Failed to capture screenshot on action: {action_name}"
+                )
+            self.frames.add(screenshot_path, png_bytes)
+            self.frame_index.add(
+                screenshot_path, self.frames.get_array(screenshot_path)
+            )
+
+            # Add screenshot and action to the list
+            self.screenshots_with_actions.append((screenshot_path, action_name))
+            if self.report_pipeline is not None:
+                self.report_pipeline.submit(screenshot_path, action_name)
+
+            # Only shown when running in a notebook, which has IPython loaded already
+            if "IPython" in sys.modules:
+                ipython_display.display(ipython_display.Image(data=png_bytes))
+            return screenshot_path
+
+    async def buffer_screenshot(self, action_name):
+        """
+        Fast mode capture, the screenshot only goes into the ring buffer. Nothing waits
+        for the page to settle, steps already do before their screenshot.
+        """
+        with self.tracer.span("screenshot", action_name, lane=self.lane):
+            target = self.popup if self.popup else self.page
+            if target == self.page:
+                await self.vitals.collect(self.page, action_name, self.lane)
+            self.ring.add(action_name, await target.screenshot())
+        return None
+
+    async def keep_failure_frames(self):
+        """
+        Saves the frames buffered in fast mode, plus one of the current page, after a
+        failure so the report shows what led up to it
+        """
+        if self.ring is None:
+            return
         target = self.popup if self.popup else self.page
+        if target and not target.is_closed():
+            try:
+                self.ring.add(
+                    "The test failed at this point.", await target.screenshot()
+                )
+            except Exception as e:
+                logging.warning(f"Failed to capture the failure screenshot: {e}")
+        frames = self.ring.drain(self.screenshots_dir)
+        for screenshot_path, action_name, png_bytes in frames:
+            self.frames.add(screenshot_path, png_bytes)
+            self.frame_index.add(
+                screenshot_path, self.frames.get_array(screenshot_path)
+            )
+            self.screenshots_with_actions.append((screenshot_path, action_name))
+        self.frames.spill_all()
         logging.info(
-            f"Screenshotting { 'popup' if self.popup else 'page'} at {target.url}"
+            f"Saved the last {len(frames)} of {self.ring.captured} screenshots to {self.screenshots_dir}"
         )
-        if not no_sleep:
-            await target.wait_for_timeout(2000)
 
-        await target.screenshot(path=screenshot_path)
+    def narrate(self, action_name):
+        """
+        Generates the TTS narration for an action, reusing cached clips
+
+        Returns:
+            tuple: The audio samples, padded with half a second of silence, and their sample rate
+        """
+        # Clean up the action name for better narration
+        cleaned_action = action_name.replace("_", " ")
+        cleaned_action = re.sub(r"([a-z])([A-Z])", r"\1 \2", cleaned_action)
+
+        with self.tracer.span(
+            "tts", cleaned_action, lane=threading.current_thread().name
+        ) as span:
+            key = NarrationCache.key(
+                NARRATION_MODEL, NARRATION_VOICE, NARRATION_LANGUAGE, cleaned_action
+            )
+            cached = self.narration_cache.get(key) if self.narration_cache else None
+            span["cached"] = bool(cached)
+            if cached:
+                audio_data, sample_rate = cached
+            else:
+                # Generate TTS audio
+                tts = openai.audio.speech.create(
+                    model=NARRATION_MODEL,
+                    voice=NARRATION_VOICE,
+                    input=cleaned_action,
+                    extra_body={"language": NARRATION_LANGUAGE},
+                    timeout=NARRATION_TIMEOUT,
+                )
+                audio_content = base64.b64decode(tts.content)
 
-        if not os.path.exists(screenshot_path):
-            raise Exception(f"Failed to capture screenshot on action: {action_name}")
+                # Read the audio and get its original sample rate
+                audio_data, sample_rate = sf.read(io.BytesIO(audio_content))
+                if self.narration_cache:
+                    self.narration_cache.put(key, audio_data, sample_rate)
 
-        # Add screenshot and action to the list
-        self.screenshots_with_actions.append((screenshot_path, action_name))
+        # Add small silence padding at the end (0.5 seconds)
+        padding = int(0.5 * sample_rate)  # Use the actual sample rate
+        audio_data = np.pad(audio_data, (0, padding), mode="constant")
+        return audio_data, sample_rate
 
-        display(Image(filename=str(screenshot_path)))
-        return screenshot_path
+    def narrate_or_silence(self, idx, action_name):
+        """Narrates a clip, returning None so it falls back to silence if that fails"""
+        try:
+            return self.narrate(action_name)
+        except Exception as e:
+            logging.error(f"Error processing clip {idx}: {e}")
+            return None
 
     def create_video_report(self, max_size_mb=10):
         """
-        Creates a video from all screenshots taken during the test run with Google TTS narration
-        using OpenCV and FFMPEG for video processing. Adjusts framerate and compression if output exceeds size limit.
+        Creates a video from all screenshots taken during the test run with TTS narration,
+        streaming the frames into a single FFMPEG pass that also muxes in the audio.
+        The video bitrate is capped from the total narration length so the output fits
+        the size limit without re-encoding.
 
         Args:
             max_size_mb (int): Maximum size of the output video in MB. Defaults to 10.
@@ -123,15 +2402,41 @@ class FrontEndTest:
             return None
         try:
             if not self.screenshots_with_actions:
-                logging.warning("No screenshots found to create video")
+                # Passing fast mode runs have nothing to report on purpose
+                if self.ring is None:
+                    logging.warning("No screenshots found to create video")
                 return None
 
+            final_video_path = os.path.abspath(os.path.join(os.getcwd(), "report.mp4"))
+            if self.report_pipeline is not None:
+                if self.report_pipeline.covered == len(self.screenshots_with_actions):
+                    logging.info("Joining the incrementally built report segments...")
+                    video_path = self.report_pipeline.finish(
+                        final_video_path, max_size_mb
+                    )
+                    if video_path:
+                        logging.info(
+                            f"Video report created successfully at: {video_path}"
+                        )
+                        return video_path
+                logging.info("Falling back to encoding the whole report")
+                self.report_pipeline.discard()
+
+            # Near-identical consecutive screenshots share one frame and narration
+            entries = [
+                (screenshot_path, combine_actions(actions))
+                for screenshot_path, actions in self.frame_index.group(
+                    self.screenshots_with_actions
+                )
+            ]
+            self.frame_index.log_savings(
+                len(self.screenshots_with_actions), len(entries)
+            )
+
             # Read first image to get dimensions
-            first_img = cv2.imread(self.screenshots_with_actions[0][0])
+            first_img = self.frames.get_array(entries[0][0])
             if first_img is None:
-                logging.error(
-                    f"Failed to read first screenshot: {self.screenshots_with_actions[0][0]}"
-                )
+                logging.error(f"Failed to read first screenshot: {entries[0][0]}")
                 return None
 
             height, width = first_img.shape[:2]
@@ -140,168 +2445,136 @@ class FrontEndTest:
             temp_dir = tempfile.mkdtemp()
             logging.info("Creating temporary directory for audio files...")
 
-            def create_video(fps):
-                """Helper function to create video at specified FPS"""
-                video_path = os.path.join(temp_dir, "video_no_audio.mp4")
-                fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-                out = cv2.VideoWriter(video_path, fourcc, fps, (width, height))
-                total_frames = 0
-
-                for idx, (screenshot_path, _) in enumerate(
-                    self.screenshots_with_actions
-                ):
-                    frames_needed = int(max(all_audio_lengths[idx], 2.0) * fps)
-                    img = cv2.imread(screenshot_path)
-                    for _ in range(frames_needed):
-                        out.write(img)
-                        total_frames += 1
-
-                out.release()
-                return video_path, total_frames
-
-            def combine_video_audio(silent_video_path, audio_path, output_path, crf=23):
-                """Helper function to combine video and audio with compression"""
-                subprocess.run(
-                    [
-                        "ffmpeg",
-                        "-i",
-                        silent_video_path,
-                        "-i",
-                        audio_path,
-                        "-c:v",
-                        "libx264",  # Use H.264 codec
-                        "-crf",
-                        str(
-                            crf
-                        ),  # Compression quality (18-28 is good, higher = more compression)
-                        "-preset",
-                        "medium",  # Encoding speed preset
-                        "-c:a",
-                        "aac",
-                        "-b:a",
-                        "128k",  # Compress audio bitrate
-                        output_path,
-                        "-y",
-                        "-loglevel",
-                        "error",
+            def encode_video(output_path, fps=30, crf=23, max_video_kbps=None):
+                """
+                Helper function to encode the report in a single ffmpeg pass, streaming
+                raw frames over stdin and muxing in the narration. With max_video_kbps
+                the CRF quality target is capped so the bitrate never exceeds it.
+                """
+                command = [
+                    "ffmpeg",
+                    "-f",
+                    "rawvideo",
+                    "-pix_fmt",
+                    "bgr24",
+                    "-s",
+                    f"{width}x{height}",
+                    "-framerate",
+                    str(FRAME_INPUT_FPS),
+                    "-i",
+                    "pipe:0",
+                ]
+                if os.path.exists(concatenated_audio_path):
+                    command += ["-i", concatenated_audio_path]
+                command += [
+                    # H.264 in yuv420p needs even dimensions
+                    "-vf",
+                    "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                    "-r",
+                    str(fps),
+                    "-c:v",
+                    "libx264",  # Use H.264 codec
+                    "-pix_fmt",
+                    "yuv420p",
+                    "-crf",
+                    str(
+                        crf
+                    ),  # Compression quality (18-28 is good, higher = more compression)
+                ]
+                if max_video_kbps:
+                    command += [
+                        "-maxrate",
+                        f"{max_video_kbps}k",
+                        "-bufsize",
+                        f"{max_video_kbps * 2}k",
                     ]
+                command += [
+                    "-preset",
+                    "medium",  # Encoding speed preset
+                    "-c:a",
+                    "aac",
+                    "-b:a",
+                    f"{AUDIO_BITRATE_KBPS}k",  # Compress audio bitrate
+                    output_path,
+                    "-y",
+                    "-loglevel",
+                    "error",
+                ]
+                process = subprocess.Popen(
+                    command, stdin=subprocess.PIPE, stderr=subprocess.PIPE
                 )
+                # Stills are held for their narration by repeating the frame, rounding
+                # against the running total so frames never drift from the audio
+                with self.tracer.span("report", "Writing frames", lane="report"):
+                    elapsed = 0.0
+                    frames_written = 0
+                    try:
+                        for idx, (screenshot_path, _) in enumerate(entries):
+                            img = self.frames.get_array(screenshot_path)
+                            if img is None:
+                                img = np.zeros((height, width, 3), np.uint8)
+                            elif img.shape[:2] != (height, width):
+                                img = cv2.resize(img, (width, height))
+                            frame = img.tobytes()
+                            elapsed += all_audio_lengths[idx]
+                            frames_needed = (
+                                round(elapsed * FRAME_INPUT_FPS) - frames_written
+                            )
+                            for _ in range(frames_needed):
+                                process.stdin.write(frame)
+                            frames_written += frames_needed
+                    except BrokenPipeError:
+                        pass
+                _, errors = process.communicate()
+                if process.returncode != 0:
+                    raise Exception(
+                        f"ffmpeg failed with exit code {process.returncode}: {errors.decode(errors='replace')}"
+                    )
 
             # Create paths for our files
-            final_video_path = os.path.abspath(os.path.join(os.getcwd(), "report.mp4"))
             concatenated_audio_path = os.path.join(temp_dir, "combined_audio.wav")
 
-            # Lists to store audio data and durations
-            all_audio_data = []
-            all_audio_lengths = []
-
-            # First pass: Generate audio files and calculate durations
+            # First pass: Generate audio clips concurrently and calculate durations
             logging.info("Generating audio narrations...")
-            for idx, (_, action_name) in enumerate(
-                tqdm(
-                    self.screenshots_with_actions,
-                    desc="Generating audio files",
-                    unit="clip",
-                )
+            with self.tracer.span(
+                "report", "Generating narration", lane="report", clips=len(entries)
             ):
-                # Generate audio file for this action
-                audio_path = os.path.join(temp_dir, f"audio_{idx}.wav")
-
-                try:
-                    # Clean up the action name for better narration
-                    cleaned_action = action_name.replace("_", " ")
-                    cleaned_action = re.sub(r"([a-z])([A-Z])", r"\1 \2", cleaned_action)
-
-                    # Generate TTS audio
-                    tts = openai.audio.speech.create(
-                        model="tts-1",
-                        voice="HAL9000",
-                        input=cleaned_action,
-                        extra_body={"language": "en"},
+                with ThreadPoolExecutor(max_workers=NARRATION_CONCURRENCY) as pool:
+                    # map keeps the clips in screenshot order whichever finishes first
+                    all_audio_data = list(
+                        tqdm.tqdm(
+                            pool.map(
+                                self.narrate_or_silence,
+                                range(len(entries)),
+                                [action for _, action in entries],
+                            ),
+                            total=len(entries),
+                            desc="Generating audio files",
+                            unit="clip",
+                        )
                     )
-                    audio_content = base64.b64decode(tts.content)
-
-                    # Write the raw audio first
-                    with open(audio_path, "wb") as audio_file:
-                        audio_file.write(audio_content)
-
-                    # Read the audio and get its original sample rate
-                    audio_data, sample_rate = sf.read(audio_path)
-
-                    # Add small silence padding at the end (0.5 seconds)
-                    padding = int(0.5 * sample_rate)  # Use the actual sample rate
-                    audio_data = np.pad(audio_data, (0, padding), mode="constant")
-
-                    # Store audio data and sample rate
-                    all_audio_data.append((audio_data, sample_rate))
-                    audio_duration = len(audio_data) / sample_rate
-                    all_audio_lengths.append(max(audio_duration, 2.0))
-
-                except Exception as e:
-                    logging.error(f"Error processing clip {idx}: {e}")
-                    all_audio_lengths.append(2.0)
-            if all_audio_data:
-                # Use the sample rate from the first audio clip
-                target_sample_rate = all_audio_data[0][1]
-
-                # Resample all audio to match the first clip's sample rate if needed
-                resampled_audio = []
-                for audio_data, sr in all_audio_data:
-                    if sr != target_sample_rate:
-                        # You might need to add a resampling library like librosa here
-                        # resampled = librosa.resample(audio_data, orig_sr=sr, target_sr=target_sample_rate)
-                        resampled = audio_data  # Placeholder for actual resampling
-                    else:
-                        resampled = audio_data
-                    resampled_audio.append(resampled)
-
-                # Combine the resampled audio
-                combined_audio = np.concatenate(resampled_audio)
-
-                # Write with the correct sample rate
-                sf.write(concatenated_audio_path, combined_audio, target_sample_rate)
-
-            # Initial attempt with 30 fps and moderate compression
-            initial_fps = 30
-            silent_video_path, total_frames = create_video(initial_fps)
-            combine_video_audio(
-                silent_video_path, concatenated_audio_path, final_video_path, crf=23
-            )
-
-            # Get file size in MB
-            file_size_mb = os.path.getsize(final_video_path) / (1024 * 1024)
-
-            # If file is still too large, try increasing compression and reducing fps
-            if file_size_mb > max_size_mb:
-                logging.info(
-                    f"Video size ({file_size_mb:.2f}MB) exceeds limit of {max_size_mb}MB. Adjusting settings..."
-                )
-
-                # First try stronger compression
-                logging.info("Attempting stronger compression...")
-                combine_video_audio(
-                    silent_video_path, concatenated_audio_path, final_video_path, crf=28
-                )
-                file_size_mb = os.path.getsize(final_video_path) / (1024 * 1024)
-
-                # If still too large, reduce fps and maintain high compression
-                if file_size_mb > max_size_mb:
-                    # Calculate new fps based on size ratio with some extra buffer
-                    new_fps = int(
-                        initial_fps * (max_size_mb / file_size_mb) * 0.85
-                    )  # 15% buffer
-                    new_fps = max(new_fps, 10)  # Don't go below 10 fps
+            if self.narration_cache:
+                self.narration_cache.save()
+            # Every screenshot stays on screen for at least 2 seconds
+            all_audio_lengths = [
+                max(len(clip[0]) / clip[1], 2.0) if clip else 2.0
+                for clip in all_audio_data
+            ]
+            write_narration_track(
+                all_audio_data, all_audio_lengths, concatenated_audio_path
+            )
 
-                    logging.info(
-                        f"Recreating video with {new_fps} fps and high compression..."
-                    )
-                    silent_video_path, total_frames = create_video(new_fps)
-                    combine_video_audio(
-                        silent_video_path,
-                        concatenated_audio_path,
-                        final_video_path,
-                        crf=28,
-                    )
+            # Work out the bitrate that fits the size budget from the known duration
+            total_duration = sum(all_audio_lengths)
+            max_video_kbps = video_bitrate_cap(max_size_mb, total_duration)
+            logging.info(
+                f"Encoding {total_duration:.1f}s of video capped at {max_video_kbps}kbps "
+                f"to stay within {max_size_mb}MB"
+            )
+            with self.tracer.span(
+                "report", "Encoding video", lane="report", kbps=max_video_kbps
+            ):
+                encode_video(final_video_path, crf=23, max_video_kbps=max_video_kbps)
 
             # Cleanup
             logging.info("Cleaning up temporary files...")
@@ -321,7 +2594,15 @@ class FrontEndTest:
             logging.error(f"Error creating video report: {e}")
             return None
 
-    async def prompt_agent(self, action_name, screenshot_path):
+    async def prompt_agent(self, action_name, screenshot_path, crop=None):
+        """
+        Asks the agent whether the screenshot shows the action succeeded
+
+        Args:
+            action_name (str): Description of the action that was performed
+            screenshot_path (str): Screenshot taken after the action
+            crop (tuple): Optional (x, y, width, height) region under test
+        """
 
         prompt = f"""The goal will be to view the screenshot and determine if the action was successful or not.
 
@@ -331,56 +2612,74 @@ class FrontEndTest:
 
         In your <answer> block, respond with only one word `True` if the screenshot is as expected, to indicate if the action was successful. If the action was not successful, explain why in the <answer> block, this will be sent to the developers as the error in the test.
         """
-        with open(screenshot_path, "rb") as f:
-            screenshot = f.read().decode("utf-8")
-        screenshot = f"data:image/png;base64,{screenshot}"
-        response = self.agixt.prompt_agent(
-            agent_name="XT",
-            prompt_name="Think About It",
-            prompt_args={"user_input": prompt, "file_urls": [screenshot]},
-        )
-        logging.info(f"Agent response: {response}")
-        updated_response = re.sub(r"[^a-zA-Z]", "", response).lower()
-        if updated_response != "true":
-            raise Exception(
-                f"Action failed: {action_name}\nAI suggested the action was not successful:\n{response}"
+        with self.tracer.span("verify", action_name, lane=self.lane) as span:
+            # The same check on a frame that already passed needs no second opinion
+            if self.frame_index.find_verified(screenshot_path, action_name, crop):
+                self.frame_index.verifications_skipped += 1
+                span["skipped"] = True
+                logging.info(f"Skipping verification of near-duplicate: {action_name}")
+                return
+            screenshot = prepare_verification_image(
+                self.frames.get_array(screenshot_path), crop=crop
             )
+            response = await self.agixt.prompt_agent(
+                agent_name="XT",
+                prompt_name="Think About It",
+                prompt_args={"user_input": prompt, "file_urls": [screenshot]},
+            )
+            logging.info(f"Agent response: {response}")
+            updated_response = re.sub(r"[^a-zA-Z]", "", response).lower()
+            if updated_response != "true":
+                raise Exception(
+                    f"Action failed: {action_name}\nAI suggested the action was not successful:\n{response}"
+                )
+            self.frame_index.mark_verified(screenshot_path, action_name, crop)
 
     async def handle_mfa_screen(self):
-        """Handle MFA screenshot"""
-        # Decode QR code from screenshot
-        await asyncio.sleep(2)
-        # await self.take_screenshot(f"Screenshot prior to attempting to decode QR code")
-        nparr = np.frombuffer(await self.page.screenshot(), np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        otp_uri = None
-        decoded_objects = decode(img)
-        for obj in decoded_objects:
-            if obj.type == "QRCODE":
-                otp_uri = obj.data.decode("utf-8")
-                break
-        if not otp_uri:
-            raise Exception("Failed to decode QR code")
-        logging.info(f"Retrieved OTP URI: {otp_uri}")
-        match = re.search(r"secret=([\w\d]+)", otp_uri)
-        if match:
-            secret_key = match.group(1)
-            logging.info("Successfully extracted secret key")
-            totp = pyotp.TOTP(secret_key)
-            otp_token = totp.now()
+        """
+        Enrolls in multifactor authentication and submits the first one-time password
+
+        Returns:
+            str: The TOTP secret
+        """
+        with self.tracer.span("mfa", "Multifactor enrollment", lane=self.lane) as span:
+            await self.take_screenshot(
+                "The multifactor authentication enrollment screen shows a QR code for the user to scan."
+            )
+            # Registration passes the otpauth URI the QR code shows in the login URL
+            secret_key = find_otp_secret(self.page.url)
+            span["source"] = "url"
+            if not secret_key:
+                # Decode just the QR code, its white wrapper keeps the quiet zone around it
+                span["source"] = "qr"
+                qr_code = self.page.locator('svg[viewBox="0 0 256 256"]').first
+                png_bytes = await qr_code.locator("xpath=..").screenshot()
+                img = cv2.imdecode(np.frombuffer(png_bytes, np.uint8), cv2.IMREAD_COLOR)
+                for obj in pyzbar.decode(img):
+                    if obj.type == "QRCODE":
+                        secret_key = find_otp_secret(obj.data.decode("utf-8"))
+                        break
+            if not secret_key:
+                raise Exception("Failed to read the OTP secret from the URL or QR code")
+            logging.info(f"Successfully extracted secret key from the {span['source']}")
+            otp_token = await fresh_totp(secret_key)
             await self.page.fill("#token", otp_token)
             logging.info("Entering OTP token")
+            # No settle wait, the code has to be submitted while it is still valid
             await self.take_screenshot(
-                "The user scans the QR code and enrolls it in their authenticator app, then entering the one-time password therefrom."
+                "The user scans the QR code and enrolls it in their authenticator app, then entering the one-time password therefrom.",
+                no_sleep=True,
             )
             logging.info("Submitting OTP token")
             await self.page.click('button[type="submit"]')
-        else:
-            raise Exception("Failed to extract secret key from OTP URI")
-        return secret_key
+            return secret_key
 
     async def test_action(
-        self, action_description, action_function, followup_function=None
+        self,
+        action_description,
+        action_function,
+        followup_function=None,
+        verify_selector=None,
     ):
         """
         Generic method to perform a test action
@@ -388,18 +2687,43 @@ class FrontEndTest:
         Args:
             action_description (str): Description of the action being performed
             action_function (callable): Function to perform the action (async)
+            followup_function (callable): Optional function to run after the action (async)
+            verify_selector (str): Optional selector of the region to verify, defaults to the whole page
         """
         try:
-            logging.info(action_description)
-            await asyncio.sleep(5)
-            await self.page.wait_for_load_state("domcontentloaded", timeout=90000)
-            result = await action_function()
-            await self.page.wait_for_load_state("domcontentloaded", timeout=90000)
-            await asyncio.sleep(5)
-            if followup_function:
-                await followup_function()
-            await self.take_screenshot(f"{action_description}")
-            return result
+            with self.tracer.span("step", action_description, lane=self.lane) as span:
+                logging.info(action_description)
+                start = time.monotonic()
+                waited = await self.wait_until_settled()
+                result = await action_function()
+                if followup_function:
+                    await followup_function()
+                waited += await self.wait_until_settled()
+                screenshot_path = await self.take_screenshot(
+                    f"{action_description}", no_sleep=True
+                )
+                if "verify" in self.features and screenshot_path:
+                    crop = None
+                    if verify_selector:
+                        box = await self.page.locator(
+                            verify_selector
+                        ).first.bounding_box()
+                        if box:
+                            crop = (box["x"], box["y"], box["width"], box["height"])
+                    self.verification.submit(action_description, screenshot_path, crop)
+                duration = time.monotonic() - start
+                span["waited"] = waited
+                self.step_timings.append(
+                    {
+                        "action": action_description,
+                        "waited": waited,
+                        "duration": duration,
+                    }
+                )
+                logging.info(
+                    f"Step took {duration:.2f}s, {waited:.2f}s of which waiting for the page to settle"
+                )
+                return result
         except Exception as e:
             logging.error(f"Failed {action_description}: {e}")
             raise Exception(f"Failed {action_description}: {e}")
@@ -525,12 +2849,31 @@ class FrontEndTest:
                     "Can you show be a basic 'hello world' Python example?",
                 ),
             )
+            detector = ChatCompletionDetector(self.page)
+
+            async def send():
+                # Armed after the step's settle wait, right before the message leaves
+                await detector.arm()
+                await self.page.click("#send-message")
+
             await self.test_action(
                 "When the user hits send, or the enter key, the message is sent to the agent and it begins thinking.",
-                lambda: self.page.click("#send-message"),
+                send,
             )
 
-            await asyncio.sleep(90)
+            completion = await detector.wait()
+            logging.info(
+                f"Agent reply complete after {completion['elapsed']:.2f}s "
+                f"(reply: {completion['reply']}, rename: {completion['rename']}, "
+                f"name: {completion['conversation_name']})"
+            )
+            self.step_timings.append(
+                {
+                    "action": "Waiting for the agent to reply",
+                    "waited": completion["elapsed"],
+                    "duration": completion["elapsed"],
+                }
+            )
 
             await self.take_screenshot(
                 "When the agent finishes thinking, the agent responds alongside providing its thought process and renaming the conversation contextually."
@@ -582,6 +2925,27 @@ class FrontEndTest:
             logging.error(f"Error nagivating to chat: {e}")
             raise Exception(f"Error nagivating to chat: {e}")
 
+    async def send_chat_message(self, message):
+        """
+        Sends a chat message and waits for the agent to reply
+
+        Returns:
+            tuple: Seconds until the message left the browser, and the completion
+                result of ChatCompletionDetector.wait
+        """
+        await self.page.fill("#message", message)
+        # Only the reply matters under load, do not wait for the conversation rename
+        detector = ChatCompletionDetector(self.page, rename_timeout_ms=0)
+        await detector.arm()
+        start = time.monotonic()
+        async with self.page.expect_request(
+            lambda request: "/v1/chat/completions" in request.url
+            and request.method == "POST"
+        ):
+            await self.page.click("#send-message")
+        sent = time.monotonic() - start
+        return sent, await detector.wait()
+
     async def handle_commands_workflow(self):
         """Handle commands workflow scenario"""
         # TODO: Implement commands workflow test
@@ -622,23 +2986,18 @@ class FrontEndTest:
                 lambda: self.page.click("text=Continue with Email"),
             )
 
-            # Generate OTP code from saved MFA token
-            otp = pyotp.TOTP(mfa_token).now()
-
-            # Fill in the OTP code
-            await self.test_action(
-                f"The user enters their MFA code: {otp}",
-                lambda: self.page.wait_for_selector("#token", state="visible"),
-                lambda: self.page.fill("#token", otp),
-            )
+            async def enter_otp():
+                await self.page.wait_for_selector("#token", state="visible")
+                # Generated right before it is typed and submitted, the settle waits
+                # of a separate step could otherwise outlast it
+                otp = await fresh_totp(mfa_token)
+                await self.page.fill("#token", otp)
+                await self.page.click('button[type="submit"]')
 
-            # Submit the login form
+            # Fill in the OTP code from the saved MFA token and submit the login form
             await self.test_action(
-                "The user submits the MFA token to complete login",
-                lambda: self.page.wait_for_selector(
-                    'button[type="submit"]', state="visible"
-                ),
-                lambda: self.page.click('button[type="submit"]'),
+                "The user enters their MFA code and submits it to complete login",
+                enter_otp,
             )
 
             # Verify successful login by waiting for chat page
@@ -1243,78 +3602,919 @@ class FrontEndTest:
         await self.page.wait_for_timeout(15000)
         await self.take_screenshot("payment was processed and subscription is active")
 
+    async def new_page(self, browser, storage_state=None):
+        """Opens an isolated browser context on the given browser and a page in it"""
+        self.browser = browser
+        self.context = await browser.new_context(
+            viewport={"width": 1367, "height": 924}, storage_state=storage_state
+        )
+        await self.resources.attach(self.context)
+        self.page = await self.context.new_page()
+        self.page.on("console", print_args)
+        await self.readiness_for(self.page).attach()
+        await self.vitals.attach(self.page)
+        self.page.set_default_timeout(20000)
+
+    async def resume_session(self, user):
+        """
+        Opens the chat with a cached session, returns the cached entry if still signed in
+        """
+        entry = self.auth_cache.load(self.base_uri, user)
+        if not entry:
+            return None
+        await self.new_page(self.browser, storage_state=entry["storage_state"])
+        logging.info(f"Resuming cached session for {entry['email']}")
+        await self.page.goto(f"{self.base_uri}/chat")
+        await self.wait_until_settled()
+        # The middleware sends anyone without a valid JWT back to /user
+        if "/user" in self.page.url or not self.page.url.startswith(self.base_uri):
+            logging.info("Cached session was rejected, falling back to a full sign up")
+            self.auth_cache.invalidate(self.base_uri, user)
+            await self.context.close()
+            return None
+        await self.take_screenshot(
+            "The user returns with a saved session and lands directly in the chat interface."
+        )
+        return entry
+
+    async def save_session(self, user, email, mfa_token):
+        if self.auth_cache and mfa_token:
+            self.auth_cache.save(
+                self.base_uri,
+                user,
+                email,
+                mfa_token,
+                await self.context.storage_state(),
+            )
+
+    async def open_session(self, browser, user="default"):
+        """
+        Opens an isolated browser context on the given browser and signs in a user,
+        reusing a cached session for that user when one is available
+
+        Returns:
+            tuple: The user's email address and MFA token
+        """
+        self.browser = browser
+        if self.auth_cache and "google" not in self.features:
+            entry = await self.resume_session(user)
+            if entry:
+                return entry["email"], entry["mfa_token"]
+
+        await self.new_page(browser)
+        logging.info(f"Navigating to {self.base_uri}")
+        await self.page.goto(self.base_uri)
+        await self.take_screenshot(
+            "The landing page of the application is the first thing the user sees."
+        )
+
+        logging.info("Clicking 'Register or Login' button")
+        await self.page.click('text="Login or Register"')
+        await self.take_screenshot(
+            "The user has multiple authentication options if enabled, including several o auth options such as Microsoft or Google. For this test, we will use the basic email authentication."
+        )
+
+        if "google" not in self.features:
+            try:
+                email, mfa_token = await self.handle_register()
+            except Exception as e:
+                logging.error(f"Error registering user: {e}")
+                raise Exception(f"Error registering user: {e}")
+        if "google" in self.features:
+            email = await self.handle_google()
+            mfa_token = ""
+        if "stripe" in self.features:
+            await self.handle_stripe()
+
+        await self.handle_train_user_agent()
+        await self.handle_train_company_agent()
+        await self.save_session(user, email, mfa_token)
+        return email, mfa_token
+
+    # Scenarios run after sign up, in this order when run sequentially
+    SCENARIOS = ("chat", "login", "update_user", "invite_user")
+
+    async def run_scenario(self, name, email, mfa_token, user="default"):
+        """Runs the handle_* steps of a single scenario on a signed up session"""
+        if name == "chat":
+            await self.handle_chat()
+        elif name == "login":
+            await self.handle_logout(email=email)
+            await self.handle_login(email, mfa_token)
+            # Logging out ends the cached session, keep the new one instead
+            await self.save_session(user, email, mfa_token)
+        elif name == "update_user":
+            await self.handle_update_user()
+        elif name == "invite_user":
+            await self.handle_invite_user()
+        else:
+            raise Exception(f"Unknown scenario: {name}")
+
+    def spawn(self, name):
+        """Creates a test for one scenario, with its own user and screenshot stream"""
+        return FrontEndTest(
+            base_uri=self.base_uri,
+            features=",".join(self.features),
+            readiness=self.readiness_settings,
+            screenshots_dir=os.path.join(self.screenshots_dir, name),
+            auth_cache=self.auth_cache,
+            # Shared so the merged report can read every scenario's frames
+            frames=self.frames,
+            frame_index=self.frame_index,
+            # One queue, so identical checks across scenarios are only asked once
+            verification=self.verification,
+            agixt=self.agixt,
+            tracer=self.tracer,
+            lane=name,
+            vitals=self.vitals,
+            browser_server=self.browser_server,
+            resources=self.resources,
+            fast=self.ring is not None,
+        )
+
+    async def launch_browser(self, headless=not is_desktop()):
+        """
+        Returns the connected browser, launching one or attaching to the warm browser
+        server when one is configured, and reconnecting if the old one went away
+        """
+        async with self.browser_lock:
+            # Whoever held the lock may have reconnected already
+            if self.browser and self.browser.is_connected():
+                return self.browser
+            if self.browser_server:
+                self.browser = await self.browser_server.connect(
+                    self.playwright, headless
+                )
+            else:
+                self.browser = await self.playwright.chromium.launch(headless=headless)
+            return self.browser
+
+    def write_trace(self):
+        """Writes the step log, trace and web vitals next to the screenshots and logs a summary"""
+        try:
+            self.tracer.write(self.screenshots_dir)
+            self.vitals.report(self.screenshots_dir)
+            self.resources.report(self.screenshots_dir)
+        except Exception as e:
+            logging.error(f"Failed to write trace: {e}")
+        self.tracer.summary()
+
+    def start_report_pipeline(self):
+        """Starts building the video report in the background as screenshots come in"""
+        # Reports are only built on Linux, see create_video_report, and fast mode only
+        # builds one after a failure
+        if (
+            not is_desktop()
+            and self.ring is None
+            and os.getenv("INCREMENTAL_REPORT", "true") != "false"
+        ):
+            self.report_pipeline = ReportPipeline(self)
+
     async def run(self, headless=not is_desktop()):
+        self.start_report_pipeline()
         try:
             async with async_playwright() as self.playwright:
-                self.browser = await self.playwright.chromium.launch(headless=headless)
-                self.context = await self.browser.new_context()
-                self.page = await self.browser.new_page()
-                self.page.on("console", print_args)
-                self.page.set_default_timeout(20000)
-                await self.page.set_viewport_size({"width": 1367, "height": 924})
-
-                logging.info(f"Navigating to {self.base_uri}")
-                await self.page.goto(self.base_uri)
-                await self.take_screenshot(
-                    "The landing page of the application is the first thing the user sees."
-                )
-
-                logging.info("Clicking 'Register or Login' button")
-                await self.page.click('text="Login or Register"')
-                await self.take_screenshot(
-                    "The user has multiple authentication options if enabled, including several o auth options such as Microsoft or Google. For this test, we will use the basic email authentication."
-                )
+                browser = await self.launch_browser(headless)
+                try:
+                    email, mfa_token = await self.open_session(browser)
+                except Exception:
+                    await self.keep_failure_frames()
+                    await browser.close()
+                    raise
 
-                if "google" not in self.features:
-                    try:
-                        email, mfa_token = await self.handle_register()
-                    except Exception as e:
-                        logging.error(f"Error registering user: {e}")
-                        await self.browser.close()
-                        raise Exception(f"Error registering user: {e}")
-                if "google" in self.features:
-                    email = await self.handle_google()
-                    mfa_token = ""
-                if "stripe" in self.features:
-                    await self.handle_stripe()
-
-                await self.handle_train_user_agent()
-                await self.handle_train_company_agent()
-                await self.handle_chat()
+                try:
+                    for name in self.SCENARIOS:
+                        await self.run_scenario(name, email, mfa_token)
+                except Exception:
+                    await self.keep_failure_frames()
+                    raise
 
                 ##
                 # Any other tests can be added here
                 ##
 
-                await self.handle_logout(email=email)
-                await self.handle_login(email, mfa_token)
-                await self.handle_update_user()
-                await self.handle_invite_user()
-
+                failures = await self.verification.drain()
+                await self.agixt.close()
                 video_path = self.create_video_report()
                 logging.info(f"Tests complete. Video report created at {video_path}")
                 await self.browser.close()
+                self.frames.spill_all()
+                self.write_trace()
+                if failures:
+                    raise Exception(
+                        f"{len(failures)} screenshots failed verification:\n"
+                        + "\n".join(failures)
+                    )
         except Exception as e:
             logging.error(f"Test failed: {e}")
+            self.verification.cancel()
+            await self.agixt.close()
             # Try to create video one last time if it failed during the test
             if not os.path.exists(os.path.join(os.getcwd(), "report.mp4")):
                 self.create_video_report()
                 pass
+            self.frames.spill_all()
+            self.write_trace()
             raise e
 
+    async def run_concurrent(
+        self, scenarios=None, concurrency=None, headless=not is_desktop(), report=True
+    ):
+        """
+        Runs scenarios concurrently, each in its own browser context on one shared browser
+
+        Every scenario signs up its own user and records its own screenshots, which are
+        merged in scenario order into a single video report at the end.
+
+        Args:
+            scenarios (list): Scenario names to run, defaults to all of SCENARIOS
+            concurrency (int): Maximum number of scenarios running at once, defaults to all
+            headless (bool): Whether to run the browser headless
+            report (bool): Whether to create the video report when done
+        """
+        scenarios = list(scenarios or self.SCENARIOS)
+        semaphore = asyncio.Semaphore(concurrency or len(scenarios))
+        tests = [self.spawn(name) for name in scenarios]
+        if report:
+            for test in tests:
+                test.start_report_pipeline()
+
+        async def drive(test, name):
+            async with semaphore:
+                start = time.monotonic()
+                logging.info(f"Starting scenario {name}")
+                try:
+                    # Every scenario keeps its own cached user so contexts stay isolated
+                    browser = await self.launch_browser(headless)
+                    email, mfa_token = await test.open_session(browser, user=name)
+                    await test.run_scenario(name, email, mfa_token, user=name)
+                    error = None
+                    logging.info(
+                        f"Scenario {name} passed in {time.monotonic() - start:.2f}s"
+                    )
+                except Exception as e:
+                    error = e
+                    logging.error(
+                        f"Scenario {name} failed after {time.monotonic() - start:.2f}s: {e}"
+                    )
+                    await test.keep_failure_frames()
+                finally:
+                    if test.context:
+                        await test.context.close()
+                self.scenario_results[name] = {
+                    "passed": error is None,
+                    "error": str(error) if error else None,
+                    "duration": time.monotonic() - start,
+                }
+                return error
+
+        async with async_playwright() as self.playwright:
+            await self.launch_browser(headless)
+            try:
+                results = await asyncio.gather(
+                    *(drive(test, name) for test, name in zip(tests, scenarios))
+                )
+                verification_failures = await self.verification.drain()
+            finally:
+                self.verification.cancel()
+                await self.agixt.close()
+                await self.browser.close()
+
+        if report and all(test.report_pipeline is not None for test in tests):
+            self.report_pipeline = ReportPipeline.merge(
+                self, [test.report_pipeline for test in tests]
+            )
+        for test, name in zip(tests, scenarios):
+            self.screenshots_by_scenario[name] = test.screenshots_with_actions
+            self.screenshots_with_actions.extend(test.screenshots_with_actions)
+            self.step_timings.extend(
+                {**timing, "scenario": name} for timing in test.step_timings
+            )
+        if report:
+            video_path = self.create_video_report()
+            logging.info(f"Tests complete. Video report created at {video_path}")
+            self.frames.spill_all()
+            self.write_trace()
+
+        failures = [
+            f"{name}: {result}"
+            for name, result in zip(scenarios, results)
+            if result is not None
+        ]
+        if failures or verification_failures:
+            raise Exception(
+                f"{len(failures)} of {len(scenarios)} scenarios failed, "
+                f"{len(verification_failures)} screenshots failed verification:\n"
+                + "\n".join(failures + verification_failures)
+            )
+
+    def run_sharded(self, shards, concurrency=None, headless=not is_desktop()):
+        """
+        Spreads the scenarios over a pool of worker processes, each with its own browser,
+        then merges their screenshots, step timings and results into one report
+
+        Args:
+            shards (int): Number of worker processes
+            concurrency (int): Maximum number of scenarios running at once per worker
+            headless (bool): Whether to run the browsers headless
+        """
+        scenarios = list(self.SCENARIOS)
+        shards = max(1, min(shards, len(scenarios)))
+        assignments = [scenarios[i::shards] for i in range(shards)]
+        # Playwright does not survive a fork, always start workers fresh
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=shards, mp_context=context) as pool:
+            futures = [
+                pool.submit(
+                    run_shard,
+                    base_uri=self.base_uri,
+                    features=",".join(self.features),
+                    readiness=self.readiness_settings,
+                    screenshots_dir=os.path.join(self.screenshots_dir, f"shard_{i}"),
+                    auth_cache=self.auth_cache,
+                    browser_server=self.browser_server,
+                    scenarios=assigned,
+                    concurrency=concurrency,
+                    headless=headless,
+                )
+                for i, assigned in enumerate(assignments)
+            ]
+            results = []
+            for i, future in enumerate(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # The worker itself died, count all of its scenarios as failed
+                    logging.error(f"Shard {i} crashed: {e}")
+                    results.append(
+                        {
+                            "scenario_results": {
+                                name: {"passed": False, "error": str(e), "duration": 0}
+                                for name in assignments[i]
+                            },
+                            "screenshots": {},
+                            "step_timings": [],
+                            "verification_failures": [],
+                            "spans": [],
+                            "vitals": [],
+                            "resources": {},
+                            "resource_sizes": {},
+                        }
+                    )
+
+        # Merge in the original scenario order rather than shard order
+        for shard, result in enumerate(results):
+            for name, outcome in result["scenario_results"].items():
+                self.scenario_results[name] = {**outcome, "shard": shard}
+            self.tracer.spans.extend(result["spans"])
+            self.vitals.samples.extend(result["vitals"])
+            self.resources.merge(result["resources"], result["resource_sizes"])
+        for name in scenarios:
+            for result in results:
+                for screenshot_path, action in result["screenshots"].get(name, []):
+                    self.screenshots_with_actions.append((screenshot_path, action))
+                    # Worker hashes stay in their process, index the merged frames here
+                    self.frame_index.add(
+                        screenshot_path, self.frames.get_array(screenshot_path)
+                    )
+            self.step_timings.extend(
+                timing
+                for result in results
+                for timing in result["step_timings"]
+                if timing.get("scenario") == name
+            )
+        with open(os.path.join(self.screenshots_dir, "results.json"), "w") as f:
+            json.dump(
+                {
+                    "scenarios": self.scenario_results,
+                    "step_timings": self.step_timings,
+                },
+                f,
+                indent=2,
+            )
+
+        video_path = self.create_video_report()
+        logging.info(f"Tests complete. Video report created at {video_path}")
+        self.write_trace()
+        failures = [
+            f"{name} (shard {outcome['shard']}): {outcome['error']}"
+            for name, outcome in self.scenario_results.items()
+            if not outcome["passed"]
+        ]
+        verification_failures = [
+            failure for result in results for failure in result["verification_failures"]
+        ]
+        if failures or verification_failures:
+            raise Exception(
+                f"{len(failures)} of {len(scenarios)} scenarios failed, "
+                f"{len(verification_failures)} screenshots failed verification:\n"
+                + "\n".join(failures + verification_failures)
+            )
+
+
+def run_shard(
+    base_uri,
+    features,
+    readiness,
+    screenshots_dir,
+    auth_cache,
+    browser_server,
+    scenarios,
+    concurrency,
+    headless,
+):
+    """Runs a shard of scenarios in a worker process and returns its results"""
+    test = FrontEndTest(
+        base_uri=base_uri,
+        features=features,
+        readiness=readiness,
+        screenshots_dir=screenshots_dir,
+        auth_cache=auth_cache,
+        browser_server=browser_server,
+    )
+    try:
+        asyncio.run(
+            test.run_concurrent(
+                scenarios, concurrency=concurrency, headless=headless, report=False
+            )
+        )
+    except Exception as e:
+        logging.error(f"Shard {screenshots_dir} failed: {e}")
+    # The parent process builds the report from these files
+    test.frames.spill_all()
+    for name in scenarios:
+        test.scenario_results.setdefault(
+            name, {"passed": False, "error": "Scenario did not run", "duration": 0}
+        )
+    return {
+        "scenario_results": test.scenario_results,
+        "screenshots": test.screenshots_by_scenario,
+        "step_timings": test.step_timings,
+        "verification_failures": test.verification.failures,
+        "spans": test.tracer.spans,
+        "vitals": test.vitals.samples,
+        "resources": test.resources.blocked,
+        # The parent opens no pages itself, it only learns sizes from its workers
+        "resource_sizes": test.resources.sizes if test.resources.learned else {},
+    }
+
+
+class LoadTest:
+    """
+    Runs the sign up and chat flows as many concurrent virtual users on one browser.
+
+    Users start evenly spread over `ramp_up` seconds, each in its own browser context
+    with screenshots off, and at most `concurrency` are active at once. Every user
+    signs up, then sends `messages` chat messages `think_time` seconds apart. Latency
+    percentiles of sign up, send and the full reply are reported along with the error
+    rate per `bucket` seconds of the run.
+
+    Args:
+        base_uri (str): Front end to load
+        users (int): Number of virtual users
+        ramp_up (float): Seconds over which the users start
+        concurrency (int): Maximum number of users active at once
+        messages (int): Chat messages sent by every user
+        think_time (float): Seconds between a reply and the next message
+        bucket (float): Width in seconds of the error rate buckets
+        output_dir (str): Directory for load.json
+        browser_server (BrowserServer): Warm browser server to connect to instead of launching
+        resources (ResourcePolicy): Resources to block, defaults to the minimal preset
+    """
+
+    MESSAGE = "Can you show be a basic 'hello world' Python example?"
+
+    def __init__(
+        self,
+        base_uri="http://localhost:3437",
+        users=10,
+        ramp_up=30,
+        concurrency=None,
+        messages=3,
+        think_time=5,
+        bucket=10,
+        output_dir=None,
+        browser_server=None,
+        resources=None,
+    ):
+        self.base_uri = base_uri
+        self.users = users
+        self.ramp_up = ramp_up
+        self.semaphore = asyncio.Semaphore(concurrency or users)
+        self.messages = messages
+        self.think_time = think_time
+        self.bucket = bucket
+        self.output_dir = output_dir or os.path.join(
+            "test_screenshots", f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        )
+        self.events = []
+        self.started = None
+        self.browser_server = browser_server
+        # Nobody looks at the pages, so only what the chat flow needs is downloaded
+        self.resources = resources or ResourcePolicy.from_env(base_uri, "minimal")
+
+    def record(self, user, kind, start, latency, error=None):
+        self.events.append(
+            {
+                "user": user,
+                "kind": kind,
+                "at": start - self.started,
+                "latency": latency,
+                "error": error,
+            }
+        )
+
+    async def run_user(self, browser, user):
+        await asyncio.sleep(user * self.ramp_up / max(self.users, 1))
+        async with self.semaphore:
+            test = FrontEndTest(
+                base_uri=self.base_uri,
+                screenshots_dir=os.path.join(self.output_dir, f"user_{user}"),
+                lane=f"user {user}",
+                screenshots=False,
+                resources=self.resources,
+            )
+            kind = "sign up"
+            start = time.monotonic()
+            try:
+                await test.new_page(browser)
+                await test.page.goto(self.base_uri)
+                await test.page.click('text="Login or Register"')
+                await test.handle_register()
+                self.record(user, kind, start, time.monotonic() - start)
+                await test.page.goto(f"{self.base_uri}/chat")
+                await test.wait_until_settled()
+                for message in range(self.messages):
+                    if message:
+                        await asyncio.sleep(self.think_time)
+                    kind = "send"
+                    start = time.monotonic()
+                    sent, completion = await test.send_chat_message(self.MESSAGE)
+                    self.record(user, kind, start, sent)
+                    kind = "response"
+                    if completion["timed_out"] or completion["reply"] is None:
+                        raise Exception("No reply before the timeout")
+                    self.record(user, kind, start, completion["elapsed"])
+            except Exception as e:
+                # A failed user stops, its remaining messages are not sent
+                logging.error(f"Virtual user {user} failed during {kind}: {e}")
+                self.record(user, kind, start, time.monotonic() - start, str(e))
+            finally:
+                if test.context:
+                    await test.context.close()
+
+    @staticmethod
+    def percentile(values, percent):
+        """Nearest-rank percentile of the values"""
+        values = sorted(values)
+        if not values:
+            return None
+        rank = max(int(np.ceil(percent / 100 * len(values))), 1)
+        return values[rank - 1]
+
+    def summary(self):
+        """
+        Latency percentiles per kind of event and the error rate over time
+
+        Returns:
+            dict: "latency" per kind and "errors" per time bucket
+        """
+        latency = {}
+        for kind in ("sign up", "send", "response"):
+            events = [event for event in self.events if event["kind"] == kind]
+            ok = [event["latency"] for event in events if not event["error"]]
+            latency[kind] = {
+                "count": len(events),
+                "errors": len(events) - len(ok),
+                **{
+                    f"p{percent}": self.percentile(ok, percent)
+                    for percent in (50, 90, 95, 99)
+                },
+            }
+        buckets = {}
+        for event in self.events:
+            bucket = buckets.setdefault(
+                int(event["at"] // self.bucket), {"requests": 0, "errors": 0}
+            )
+            bucket["requests"] += 1
+            bucket["errors"] += 1 if event["error"] else 0
+        errors = [
+            {
+                "start": index * self.bucket,
+                **bucket,
+                "error_rate": bucket["errors"] / bucket["requests"],
+            }
+            for index, bucket in sorted(buckets.items())
+        ]
+        return {"latency": latency, "errors": errors}
+
+    def report(self):
+        summary = self.summary()
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, "load.json"), "w") as f:
+            json.dump({**summary, "events": self.events}, f, indent=2)
+
+        def seconds(value):
+            return f"{value:.2f}" if value is not None else "-"
+
+        lines = [
+            f"{'Latency (s)':<12} {'Count':>6} {'Errors':>6} {'p50':>7} {'p90':>7} {'p95':>7} {'p99':>7}"
+        ]
+        for kind, row in summary["latency"].items():
+            lines.append(
+                f"{kind:<12} {row['count']:>6} {row['errors']:>6} "
+                + " ".join(
+                    f"{seconds(row[f'p{percent}']):>7}" for percent in (50, 90, 95, 99)
+                )
+            )
+        lines.append(f"{'Window (s)':<12} {'Count':>6} {'Errors':>6} {'Rate':>7}")
+        for bucket in summary["errors"]:
+            lines.append(
+                f"{bucket['start']:<12.0f} {bucket['requests']:>6} {bucket['errors']:>6} "
+                f"{bucket['error_rate']:>7.1%}"
+            )
+        logging.info(f"Load test with {self.users} virtual users:\n" + "\n".join(lines))
+        self.resources.report(self.output_dir)
+        return summary
+
+    async def run(self, headless=True):
+        self.started = time.monotonic()
+        async with async_playwright() as playwright:
+            if self.browser_server:
+                browser = await self.browser_server.connect(playwright, headless)
+            else:
+                browser = await playwright.chromium.launch(headless=headless)
+            try:
+                await asyncio.gather(
+                    *(self.run_user(browser, user) for user in range(self.users))
+                )
+            finally:
+                await browser.close()
+        return self.report()
+
+
+class TimingBaseline:
+    """
+    Baseline of step and route timings from good runs, used to catch slowdowns.
+
+    Timings are keyed by scenario and a normalized step description (emails, ids and
+    numbers replaced) or by route and web vital, and the baseline keeps the median of
+    the last `history` good runs per key. A timing regresses when it is more than
+    `tolerance` slower than the baseline and at least `min_delta` seconds slower.
+
+    Args:
+        path (str): JSON file holding the baseline
+        tolerance (float): Allowed slowdown as a fraction of the baseline
+        min_delta (float): Slowdowns below this many seconds are never regressions
+        history (int): Number of good runs each baseline value is taken from
+    """
+
+    def __init__(self, path, tolerance=0.25, min_delta=0.25, history=5):
+        self.path = path
+        self.tolerance = tolerance
+        self.min_delta = min_delta
+        self.history = history
+
+    @staticmethod
+    def step_key(scenario, action):
+        action = re.sub(r"[\w.+-]+@[\w-]+(\.[\w-]+)+", "<email>", action)
+        action = re.sub(r"[0-9a-fA-F]{8}-[0-9a-fA-F-]{27,}", "<id>", action)
+        action = re.sub(r"\d+", "<n>", action)
+        action = re.sub(r"\s+", " ", action).strip().lower()
+        return f"step:{scenario or 'main'}:{action}"
+
+    @classmethod
+    def measurements(cls, test):
+        """
+        Collects a test's step durations and route load timings in seconds
+
+        Returns:
+            dict: Median timing per key
+        """
+        values = {}
+        for timing in test.step_timings:
+            key = cls.step_key(timing.get("scenario"), timing["action"])
+            values.setdefault(key, []).append(timing["duration"])
+        for row in test.vitals.table():
+            for metric in ("ttfb", "fcp", "lcp"):
+                if row[metric] is not None:
+                    values[f"route:{row['route']}:{metric}"] = [row[metric] / 1000]
+        return {key: float(np.median(durations)) for key, durations in values.items()}
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save(self, measurements):
+        """Adds a good run to the baseline"""
+        baseline = self.load()
+        for key, value in measurements.items():
+            entry = baseline.setdefault(key, {"runs": []})
+            entry["runs"] = (entry["runs"] + [value])[-self.history :]
+            entry["median"] = float(np.median(entry["runs"]))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+        logging.info(f"Saved {len(measurements)} timings to baseline {self.path}")
+
+    def compare(self, measurements):
+        """
+        Compares a run against the baseline
+
+        Returns:
+            list: One row per timing with its baseline, change and status
+        """
+        baseline = self.load()
+        rows = []
+        for key, current in measurements.items():
+            if key not in baseline:
+                rows.append(
+                    {"key": key, "baseline": None, "current": current, "status": "new"}
+                )
+                continue
+            previous = baseline[key]["median"]
+            delta = current - previous
+            if delta > self.min_delta and current > previous * (1 + self.tolerance):
+                status = "regressed"
+            elif -delta > self.min_delta and current < previous * (1 - self.tolerance):
+                status = "improved"
+            else:
+                status = "ok"
+            rows.append(
+                {
+                    "key": key,
+                    "baseline": previous,
+                    "current": current,
+                    "delta": delta,
+                    "status": status,
+                }
+            )
+        return rows
+
+    def report(self, rows, directory):
+        """Writes the comparison to baseline_diff.json and logs what changed"""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "baseline_diff.json"), "w") as f:
+            json.dump(rows, f, indent=2)
+        changed = sorted(
+            (row for row in rows if row["status"] in ("regressed", "improved")),
+            key=lambda row: row["delta"],
+            reverse=True,
+        )
+        counts = {}
+        for row in rows:
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+        lines = [
+            "Timings against baseline: "
+            + ", ".join(f"{count} {status}" for status, count in counts.items())
+        ]
+        for row in changed:
+            # A baseline of zero still gates on min_delta, it just has no percentage
+            change = f"{row['delta']:+.2f}s"
+            if row["baseline"]:
+                change += f", {row['delta'] / row['baseline']:+.0%}"
+            lines.append(
+                f"  {row['status']:<9} {row['baseline']:7.2f}s -> {row['current']:7.2f}s "
+                f"({change}) {row['key'][:90]}"
+            )
+        logging.info("\n".join(lines))
+
 
 class TestRunner:
-    def __init__(self):
-        pass
+    def __init__(self, concurrency=None, shards=None):
+        # Number of scenarios to run at once in separate browser contexts, 0 runs them
+        # one after another on a single page
+        if concurrency is None:
+            concurrency = int(os.environ.get("TEST_CONCURRENCY", "0"))
+        # Number of worker processes to spread the scenarios over, 0 or 1 runs in process
+        if shards is None:
+            shards = int(os.environ.get("TEST_SHARDS", "0"))
+        self.concurrency = concurrency
+        self.shards = shards
+        # Set AUTH_CACHE_DIR to reuse signed in sessions between scenarios and runs
+        cache_dir = os.environ.get("AUTH_CACHE_DIR", "")
+        self.auth_cache = AuthSessionCache(cache_dir) if cache_dir else None
+        # Set STANDIN=true to verify and narrate against a local stand-in backend with
+        # fixed latency, so timings are comparable between runs
+        self.standin = (
+            StandIn.StandInServer.from_env()
+            if os.getenv("STANDIN", "") == "true"
+            else None
+        )
+        # Set LOAD_USERS to run the chat flow as that many virtual users instead
+        self.load_users = int(os.getenv("LOAD_USERS", "0"))
+        # Set BASELINE_FILE to compare timings against it, BASELINE_MODE=fail exits
+        # non-zero on regressions and BASELINE_UPDATE=true records this run as good
+        baseline_file = os.getenv("BASELINE_FILE", "")
+        self.baseline = (
+            TimingBaseline(
+                baseline_file,
+                tolerance=float(os.getenv("BASELINE_TOLERANCE", "0.25")),
+                min_delta=float(os.getenv("BASELINE_MIN_DELTA", "0.25")),
+            )
+            if baseline_file
+            else None
+        )
+        self.baseline_mode = os.getenv("BASELINE_MODE", "warn")
+        self.baseline_update = os.getenv("BASELINE_UPDATE", "false") == "true"
+        # Set BROWSER_SERVER=true to keep one warm Chromium running between runs and
+        # connect to it instead of launching a browser every time
+        self.browser_server = (
+            BrowserServer(os.getenv("BROWSER_SERVER_STATE") or None)
+            if os.getenv("BROWSER_SERVER", "false") == "true"
+            else None
+        )
+
+    def check_baseline(self, test):
+        """Compares a passed run with the baseline, exiting non-zero on gated regressions"""
+        if not self.baseline:
+            return
+        measurements = TimingBaseline.measurements(test)
+        rows = self.baseline.compare(measurements)
+        self.baseline.report(rows, test.screenshots_dir)
+        regressions = [row for row in rows if row["status"] == "regressed"]
+        if self.baseline_update:
+            self.baseline.save(measurements)
+        if regressions:
+            logging.warning(
+                f"{len(regressions)} timings regressed beyond {self.baseline.tolerance:.0%}"
+            )
+            if self.baseline_mode == "fail":
+                sys.exit(1)
+
+    def start_standin(self):
+        """Starts the stand-in backend and points the AGiXT and TTS clients at it"""
+        uri = self.standin.start_in_thread()
+        # Environment too, so sharded worker processes pick it up when importing
+        os.environ["AGIXT_URI"] = uri
+        os.environ["EZLOCALAI_URI"] = f"{uri}/v1/"
+        openai.base_url = f"{uri}/v1/"
+        return AGiXTClient(uri)
+
+    def run_test(self, test, headless=not is_desktop()):
+        if self.concurrency:
+            return test.run_concurrent(concurrency=self.concurrency, headless=headless)
+        return test.run(headless)
+
+    def run_async(self, coroutine):
+        """Runs a coroutine to completion, also inside a notebook whose loop is running"""
+        if platform.system() != "Linux":
+            loop = asyncio.ProactorEventLoop()
+            nest_asyncio.apply(loop)
+            try:
+                return loop.run_until_complete(coroutine)
+            finally:
+                loop.close()
+        if not asyncio.get_event_loop().is_running():
+            return asyncio.run(coroutine)
+        nest_asyncio.apply()
+        return asyncio.get_event_loop().run_until_complete(coroutine)
+
+    def run_load(self):
+        load = LoadTest(
+            users=self.load_users,
+            ramp_up=float(os.getenv("LOAD_RAMP_UP", "30")),
+            concurrency=int(os.getenv("LOAD_CONCURRENCY", "0")) or None,
+            messages=int(os.getenv("LOAD_MESSAGES", "3")),
+            think_time=float(os.getenv("LOAD_THINK_TIME", "5")),
+            bucket=float(os.getenv("LOAD_BUCKET", "10")),
+            browser_server=self.browser_server,
+        )
+        try:
+            self.run_async(load.run())
+        except Exception as e:
+            logging.error(f"Load test failed: {e}")
+            sys.exit(1)
 
     def run(self):
-        test = FrontEndTest(base_uri="http://localhost:3437")
+        if self.load_users:
+            return self.run_load()
+        agixt = self.start_standin() if self.standin else None
+        test = FrontEndTest(
+            base_uri="http://localhost:3437",
+            auth_cache=self.auth_cache,
+            agixt=agixt,
+            browser_server=self.browser_server,
+        )
+        if self.shards > 1:
+            try:
+                test.run_sharded(self.shards, self.concurrency or None)
+            except Exception as e:
+                logging.error(f"Test execution failed: {e}")
+                sys.exit(1)
+            self.check_baseline(test)
+            return
         try:
             if platform.system() == "Linux":
                 print("Linux Detected, using asyncio.run")
                 if not asyncio.get_event_loop().is_running():
                     try:
-                        asyncio.run(test.run())
+                        asyncio.run(self.run_test(test))
                     except Exception as e:
                         logging.error(f"Test execution failed: {e}")
                         # Make one final attempt to create video if it doesn't exist
@@ -1325,7 +4525,7 @@ class TestRunner:
                     try:
 
                         nest_asyncio.apply()
-                        asyncio.get_event_loop().run_until_complete(test.run())
+                        asyncio.get_event_loop().run_until_complete(self.run_test(test))
                     except Exception as e:
                         logging.error(f"Test execution failed: {e}")
                         if not os.path.exists(os.path.join(os.getcwd(), "report.mp4")):
@@ -1336,7 +4536,7 @@ class TestRunner:
                 loop = asyncio.ProactorEventLoop()
                 nest_asyncio.apply(loop)
                 try:
-                    loop.run_until_complete(test.run(False))
+                    loop.run_until_complete(self.run_test(test, False))
                 except Exception as e:
                     logging.error(f"Test execution failed: {e}")
                     if not os.path.exists(os.path.join(os.getcwd(), "report.mp4")):
@@ -1353,3 +4553,5 @@ class TestRunner:
                 except Exception as video_error:
                     logging.error(f"Failed to create video report: {video_error}")
             sys.exit(1)
+        # Every failure above exits, only passed runs are held against the baseline
+        self.check_baseline(test)
@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+# Fixed TOTP secret handed to every registered user, any code it generates is accepted
+STANDIN_OTP_SECRET = "JBSWY3DPEHPK3PXP"
+
+
+class StandInServer:
+    """
+    Local stand-in for the AGiXT API and the ezLocalAI TTS endpoint used by FrontEndTest.
+
+    Serves user registration, login, agent prompts and speech synthesis with fixed,
+    configurable latency and payload sizes so run timings can be compared between runs
+    on an offline machine. Latency jitter is derived from a hash of the request rather
+    than a random source, so the same request always takes the same time.
+
+    Args:
+        host (str): Interface to listen on
+        port (int): Port to listen on, 0 picks a free one
+        latency_ms (dict): Base latency per endpoint ("user", "login", "prompt", "speech")
+        jitter_ms (int): Maximum deterministic jitter added on top of the base latency
+        prompt_response_bytes (int): Size the agent response is padded to
+        speech_seconds_per_char (float): Length of synthesized speech per input character
+        sample_rate (int): Sample rate of synthesized speech
+        verdict (str): Answer returned for every agent prompt
+    """
+
+    DEFAULT_LATENCY_MS = {"user": 50, "login": 50, "prompt": 1500, "speech": 300}
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency_ms=None,
+        jitter_ms=0,
+        prompt_response_bytes=64,
+        speech_seconds_per_char=0.06,
+        sample_rate=22050,
+        verdict="True",
+    ):
+        self.host = host
+        self.port = port
+        self.latency_ms = {**self.DEFAULT_LATENCY_MS, **(latency_ms or {})}
+        self.jitter_ms = jitter_ms
+        self.prompt_response_bytes = prompt_response_bytes
+        self.speech_seconds_per_char = speech_seconds_per_char
+        self.sample_rate = sample_rate
+        self.verdict = verdict
+        self.server = None
+        self.loop = None
+        self.thread = None
+        self.requests = {}
+        self.connections = {}
+
+    @classmethod
+    def from_env(cls):
+        """Builds a server configured from STANDIN_* environment variables"""
+        return cls(
+            host=os.getenv("STANDIN_HOST", "127.0.0.1"),
+            port=int(os.getenv("STANDIN_PORT", "0")),
+            latency_ms={
+                endpoint: int(os.getenv(f"STANDIN_{endpoint.upper()}_MS", default))
+                for endpoint, default in cls.DEFAULT_LATENCY_MS.items()
+            },
+            jitter_ms=int(os.getenv("STANDIN_JITTER_MS", "0")),
+            prompt_response_bytes=int(os.getenv("STANDIN_PROMPT_BYTES", "64")),
+            speech_seconds_per_char=float(
+                os.getenv("STANDIN_SPEECH_SECONDS_PER_CHAR", "0.06")
+            ),
+            verdict=os.getenv("STANDIN_VERDICT", "True"),
+        )
+
+    @property
+    def uri(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        logging.info(f"Stand-in backend listening on {self.uri}")
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        # Idle keep-alive connections would otherwise outlive the loop
+        for writer in self.connections.values():
+            writer.close()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        logging.info(f"Stand-in backend served {self.requests}")
+
+    def start_in_thread(self):
+        """
+        Runs the server on its own event loop in a background thread
+
+        Returns:
+            str: Base URI of the server
+        """
+        started = threading.Event()
+
+        def serve():
+            self.loop = asyncio.new_event_loop()
+            self.loop.run_until_complete(self.start())
+            started.set()
+            self.loop.run_forever()
+            self.loop.run_until_complete(self.stop())
+            self.loop.close()
+
+        self.thread = threading.Thread(target=serve, daemon=True)
+        self.thread.start()
+        started.wait()
+        return self.uri
+
+    def stop_thread(self):
+        if self.thread:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.thread = None
+
+    def _delay(self, endpoint, body):
+        jitter = 0
+        if self.jitter_ms:
+            digest = hashlib.sha256(endpoint.encode("utf-8") + body).digest()
+            jitter = int.from_bytes(digest[:4], "big") % (self.jitter_ms + 1)
+        return (self.latency_ms[endpoint] + jitter) / 1000
+
+    async def _handle_connection(self, reader, writer):
+        # Connections are kept alive so pooled clients reuse them like a real server
+        task = asyncio.current_task()
+        self.connections[task] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, value = line.decode("latin-1").split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, content_type, payload = await self._route(method, path, body)
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status}\r\n"
+                        f"Content-Type: {content_type}\r\n"
+                        f"Content-Length: {len(payload)}\r\n"
+                        "Connection: keep-alive\r\n\r\n"
+                    ).encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.connections.pop(task, None)
+            writer.close()
+
+    async def _route(self, method, path, body):
+        path = path.split("?", 1)[0].rstrip("/")
+        if method != "POST":
+            return "405 Method Not Allowed", "application/json", b"{}"
+        if path == "/v1/user":
+            endpoint, handler = "user", self._register_user
+        elif path == "/v1/login":
+            endpoint, handler = "login", self._login
+        elif re.fullmatch(r"/api/agent/[^/]+/prompt", path):
+            endpoint, handler = "prompt", self._prompt_agent
+        elif path.endswith("/audio/speech"):
+            endpoint, handler = "speech", self._speech
+        else:
+            return "404 Not Found", "application/json", b'{"detail": "Not Found"}'
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        start = time.monotonic()
+        try:
+            request = json.loads(body or b"{}")
+            content_type, payload = handler(request)
+        except Exception as e:
+            logging.error(f"Stand-in {endpoint} request failed: {e}")
+            return (
+                "400 Bad Request",
+                "application/json",
+                json.dumps({"detail": str(e)}).encode("utf-8"),
+            )
+        # Sleep off whatever building the payload did not already take
+        await asyncio.sleep(
+            max(self._delay(endpoint, body) - (time.monotonic() - start), 0)
+        )
+        return "200 OK", content_type, payload
+
+    def _json(self, data):
+        return "application/json", json.dumps(data).encode("utf-8")
+
+    def _register_user(self, request):
+        return self._json(
+            {
+                "otp_uri": f"otpauth://totp/AGiXT:{request['email']}?secret={STANDIN_OTP_SECRET}&issuer=AGiXT"
+            }
+        )
+
+    def _login(self, request):
+        token = hashlib.sha256(request["email"].encode("utf-8")).hexdigest()
+        return self._json({"detail": f"http://localhost/?token={token}"})
+
+    def _prompt_agent(self, request):
+        # Padding is whitespace so the verdict still parses the same way
+        response = self.verdict.ljust(self.prompt_response_bytes)
+        return self._json({"response": response})
+
+    def _speech(self, request):
+        """Synthesizes a tone as long as the text would take to speak, as base64 WAV"""
+        # Only imported when speech is requested, the other endpoints stay lightweight
+        import numpy as np
+        import soundfile as sf
+
+        text = request.get("input", "")
+        samples = max(
+            int(len(text) * self.speech_seconds_per_char * self.sample_rate), 1
+        )
+        tone = 0.1 * np.sin(2 * np.pi * 220 * np.arange(samples) / self.sample_rate)
+        buffer = io.BytesIO()
+        sf.write(buffer, tone, self.sample_rate, format="WAV")
+        return "audio/wav", base64.b64encode(buffer.getvalue())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the stand-in backend")
+    parser.add_argument("--port", type=int, default=7437)
+    args = parser.parse_args()
+    server = StandInServer.from_env()
+    server.port = args.port
+
+    async def main():
+        await server.start()
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass